@@ -5,20 +5,515 @@ DataCombine - Combine multiple datasets into one
 Usage:
     python DataCombine.py --input dataset/ --output combined/
     python DataCombine.py --input dataset/ --output combined/ --prefix
+    python DataCombine.py --input dataset/ --output combined/ --mode hardlink
+    python DataCombine.py --input dataset/ --output combined/ --mode manifest
+    python DataCombine.py --input dataset/ --output combined/ --full
+    python DataCombine.py --input dataset/ --output combined/ --shards 32
+
+Reruns into the same output only re-read sessions that are new or changed
+since the last run (tracked in combined/.combine_state.json); --full
+rebuilds everything.
+
+Frame modes:
+    copy      copy frame files (default)
+    hardlink  hard-link frames; falls back to copying across filesystems
+    reflink   copy-on-write clone (btrfs, XFS, ... on Linux); falls back to
+              copying
+    manifest  no frames are written; JSONL image paths point at the original
+              session directories
 """
 
 import argparse
+import hashlib
 import json
+import os
+import shutil
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+import numpy as np
 from tqdm import tqdm
 
+from frame_writers import FRAME_EXTENSIONS
+
+try:
+    import fcntl
+except ImportError:  # Windows: no reflinks, frames are copied
+    fcntl = None
+
+MODES = ["copy", "hardlink", "reflink", "manifest"]
+
+# Sample index of sharded stage files: row i locates sample i
+INDEX_DTYPE = np.dtype([("shard", "<u4"), ("offset", "<u8"), ("length", "<u4")])
+SHARD_DIR = "shards"
+
+# Incremental combine state, kept in the output folder
+STATE_FILE = ".combine_state.json"
+STATE_VERSION = 1
+
+# Linux FICLONE ioctl: share the source's extents with the destination
+FICLONE = 0x40049409
+
+
+def _reflink(src: Path, dst: Path):
+    if fcntl is None:
+        raise OSError("reflink is not supported on this platform")
+    with open(src, "rb") as s, open(dst, "xb") as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        except OSError:
+            d.close()
+            os.remove(dst)
+            raise
+
+
+def _copy(src: Path, dst: Path):
+    """shutil.copy2 into a new file only"""
+    with open(src, "rb") as s, open(dst, "xb") as d:
+        shutil.copyfileobj(s, d, 1024 * 1024)
+    shutil.copystat(src, dst)
+
+
+def transfer_frame(src: Path, dst: Path, mode: str) -> str:
+    """Place src at dst according to mode, returning the method used
+
+    hardlink/reflink need source and destination on one (supporting)
+    filesystem; otherwise the frame is copied. dst must not exist
+    (FileExistsError): writing through it could modify whatever file it
+    is a hard link to, such as another session's source frame.
+    """
+    if mode in ("hardlink", "reflink"):
+        try:
+            if mode == "hardlink":
+                os.link(src, dst)
+            else:
+                _reflink(src, dst)
+            return mode
+        except FileExistsError:
+            raise
+        except OSError:
+            pass
+    _copy(src, dst)
+    return "copy"
+
+
+def _list_frames(directory: Path) -> Dict[str, int]:
+    """Frame file name -> size, from one scandir pass"""
+    frames = {}
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(FRAME_EXTENSIONS) and entry.is_file():
+                    frames[entry.name] = entry.stat().st_size
+    except FileNotFoundError:
+        pass
+    return frames
+
+
+def transfer_frames(
+    session_dirs: List[Path],
+    frames_dir: Path,
+    add_prefix: bool,
+    mode: str,
+    io_workers: int = 16,
+    claimed: Optional[Set[str]] = None,
+) -> Dict[str, int]:
+    """Transfer the frames of session_dirs into frames_dir on a thread pool
+
+    Directories are listed with one scandir each (source and destination)
+    instead of a stat per frame. Frames already present with the right
+    size are skipped. Every transferred frame is checked against the
+    source size afterwards and retried once as a plain copy. A frame whose
+    name an earlier session already owns (same file names without
+    add_prefix) is skipped, so the first session's frame is kept; claimed
+    holds the names owned by sessions before session_dirs placed in an
+    earlier run. Returns frame counts per method used, plus "failed" for
+    frames that still mismatch and "collision" for skipped duplicate names.
+    """
+    frames_dir.mkdir(parents=True, exist_ok=True)
+    existing = _list_frames(frames_dir)
+    claimed = set(claimed or ())
+    methods = defaultdict(int)
+
+    def place(src: Path, dst: Path, size: int) -> str:
+        if dst.name in existing:
+            dst.unlink()  # wrong size, e.g. cut short by an earlier run
+        method = transfer_frame(src, dst, mode)
+        if dst.stat().st_size != size:
+            dst.unlink()
+            method = transfer_frame(src, dst, "copy")
+            if dst.stat().st_size != size:
+                return "failed"
+        return method
+
+    with ThreadPoolExecutor(max_workers=max(1, io_workers)) as pool:
+        for session_dir in session_dirs:
+            dataset_name = session_dir.name
+            src_frames = session_dir / "frames"
+            futures = []
+            for name, size in sorted(_list_frames(src_frames).items()):
+                dst_name = f"{dataset_name}_{name}" if add_prefix else name
+                if dst_name in claimed:
+                    methods["collision"] += 1
+                    continue
+                claimed.add(dst_name)
+                if existing.get(dst_name) == size:
+                    continue
+                futures.append(
+                    pool.submit(place, src_frames / name, frames_dir / dst_name, size)
+                )
+
+            for future in tqdm(
+                as_completed(futures),
+                total=len(futures),
+                desc=f"Frames {dataset_name}",
+                leave=False,
+            ):
+                methods[future.result()] += 1
+
+    return dict(methods)
+
+
+def _frame_paths(images, session_dir: Path):
+    """Rewrite session-relative image paths (frames/x.png) to absolute ones"""
+    return [str((session_dir / img).resolve()) for img in images]
+
+
+# Combined output file -> the per-session file it is built from
+STAGES = {
+    "all_samples.jsonl": "metadata.jsonl",
+    "stage1_pretrain.jsonl": "stage1_pretrain.jsonl",
+    "stage2_instruct.jsonl": "stage2_instruct.jsonl",
+    "stage3_reasoning.jsonl": "stage3_reasoning.jsonl",
+}
+
+
+def convert_sample(
+    sample: Dict, output_name: str, session_dir: Path, add_prefix: bool, mode: str
+) -> Dict:
+    """Rewrite one session sample for the combined output_name file"""
+    dataset_name = session_dir.name
+
+    if output_name == "all_samples.jsonl":
+        # DataProcessor writes "file_name"; older sessions used "image"
+        key = "file_name" if "file_name" in sample else "image"
+        if mode == "manifest":
+            # Point at the frame where it already is
+            sample[key] = str((session_dir / "frames" / sample[key]).resolve())
+            sample["source"] = dataset_name
+        elif add_prefix:
+            sample[key] = f"{dataset_name}_{sample[key]}"
+            sample["source"] = dataset_name
+        return sample
+
+    # Convert to new format: {"images": ["frames/..."], "text": "..."}
+    if "image" in sample:
+        image_filename = sample.pop("image")
+        sample["images"] = [f"frames/{image_filename}"]
+    if mode == "manifest":
+        sample["images"] = _frame_paths(sample.get("images", []), session_dir)
+    elif add_prefix:
+        sample["images"] = [f"{dataset_name}/{img}" for img in sample.get("images", [])]
+    return sample
+
+
+def read_session(
+    session_dir: Path, add_prefix: bool = False, mode: str = "copy"
+) -> Dict[str, List[str]]:
+    """Converted JSONL lines of one session, per combined output file"""
+    lines = {}
+    for output_name, source_name in STAGES.items():
+        source = session_dir / source_name
+        if not source.exists():
+            continue
+        out = []
+        with open(source, "r", encoding="utf-8") as f:
+            for line in f:
+                sample = convert_sample(
+                    json.loads(line), output_name, session_dir, add_prefix, mode
+                )
+                out.append(json.dumps(sample, ensure_ascii=False) + "\n")
+        lines[output_name] = out
+    return lines
+
+
+def iter_sessions(
+    session_dirs: List[Path], add_prefix: bool, mode: str, jobs: int
+) -> Iterator[Tuple[Path, Dict[str, List[str]]]]:
+    """read_session over session_dirs, yielded in order
+
+    With jobs > 1 sessions are parsed in worker processes, at most
+    2 * jobs ahead of the writer, so memory is bounded by a few sessions
+    rather than the whole corpus.
+    """
+    if jobs <= 1:
+        for session_dir in session_dirs:
+            yield session_dir, read_session(session_dir, add_prefix, mode)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = deque()
+        for session_dir in session_dirs:
+            pending.append(
+                (session_dir, pool.submit(read_session, session_dir, add_prefix, mode))
+            )
+            if len(pending) >= 2 * jobs:
+                done_dir, future = pending.popleft()
+                yield done_dir, future.result()
+        while pending:
+            done_dir, future = pending.popleft()
+            yield done_dir, future.result()
+
+
+def session_fingerprint(session_dir: Path, previous: Optional[Dict] = None) -> Dict:
+    """Content hash of a session's JSONL files
+
+    The hash from previous is reused when every file's size and mtime
+    still match it, so unchanged sessions are not re-read.
+    """
+    files = {}
+    for source_name in STAGES.values():
+        source = session_dir / source_name
+        if source.exists():
+            stat = source.stat()
+            files[source_name] = [stat.st_size, stat.st_mtime_ns]
+
+    if previous is not None and previous.get("files") == files:
+        return {"files": files, "hash": previous["hash"]}
+
+    digest = hashlib.sha1()
+    for source_name in sorted(files):
+        digest.update(source_name.encode("utf-8") + b"\0")
+        with open(session_dir / source_name, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    return {"files": files, "hash": digest.hexdigest()}
+
+
+def load_state(state_path: Path, options: Dict) -> List[Dict]:
+    """Session records of the last combine, [] if unusable
+
+    Each record holds the session name, its fingerprint, its sample counts,
+    the byte offset where each combined file ended after it and whether
+    its frames were placed ("frames").
+    """
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return []
+    if state.get("version") != STATE_VERSION or state.get("options") != options:
+        return []
+
+    # The combined files must still hold everything the state describes
+    sessions = state["sessions"]
+    if sessions:
+        for output_name, end in sessions[-1]["end"].items():
+            path = state_path.parent / output_name
+            if not path.exists() or path.stat().st_size < end:
+                return []
+    return sessions
 
-def combine_dataset(input_dir: Path, output_dir: Path, add_prefix: bool = False):
-    """Combine all sub-dataset JSONL files into one"""
+
+def save_state(state_path: Path, options: Dict, sessions: List[Dict]):
+    tmp = state_path.with_name(state_path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(
+            {"version": STATE_VERSION, "options": options, "sessions": sessions}, f
+        )
+    os.replace(tmp, state_path)
+
+
+class StageWriters:
+    """Buffered writers for the combined files
+
+    Without offsets every file is written as .tmp and renamed into place
+    on close. With offsets (from the combine state) the existing files
+    are truncated to them and appended to in place. A stage file is only
+    kept once some session has samples for it, except all_samples.jsonl
+    which is always written.
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        offsets: Optional[Dict[str, int]] = None,
+        buffer_size: int = 1024 * 1024,
+    ):
+        self.output_dir = output_dir
+        self.offsets = offsets
+        self.buffer_size = buffer_size
+        self._files = {}
+
+    def _tmp_path(self, output_name: str) -> Path:
+        return self.output_dir / f"{output_name}.tmp"
+
+    def _open(self, output_name: str):
+        if self.offsets is None:
+            return open(self._tmp_path(output_name), "wb", buffering=self.buffer_size)
+        path = self.output_dir / output_name
+        f = open(path, "r+b" if path.exists() else "w+b", buffering=self.buffer_size)
+        f.truncate(self.offsets.get(output_name, 0))
+        f.seek(0, os.SEEK_END)
+        return f
+
+    def write(self, output_name: str, lines: List[str]):
+        f = self._files.get(output_name)
+        if f is None:
+            f = self._files[output_name] = self._open(output_name)
+        f.write("".join(lines).encode("utf-8"))
+
+    def ends(self) -> Dict[str, int]:
+        """Byte offset where each file written so far currently ends"""
+        ends = dict(self.offsets or {})
+        ends.update((name, f.tell()) for name, f in self._files.items())
+        return ends
+
+    def close(self):
+        self.write("all_samples.jsonl", [])
+        if self.offsets is not None:
+            # Files this run never opened still need cutting back
+            for output_name in STAGES:
+                path = self.output_dir / output_name
+                if output_name not in self._files and path.exists():
+                    self.write(output_name, [])
+        for output_name, f in self._files.items():
+            empty = f.tell() == 0
+            f.close()
+            path = self._tmp_path(output_name) if self.offsets is None else None
+            if path is not None:
+                os.replace(path, self.output_dir / output_name)
+            if empty and output_name != "all_samples.jsonl":
+                os.remove(self.output_dir / output_name)
+        self._files = {}
+
+    def abort(self):
+        for output_name, f in self._files.items():
+            f.close()
+            if self.offsets is None:
+                os.remove(self._tmp_path(output_name))
+        self._files = {}
+
+
+def shard_stage_file(stage_path: Path, shards_dir: Path, n_shards: int, total: int):
+    """Split a combined stage file into n_shards balanced JSONL shards
+
+    Sample i goes to shard i * n_shards // total, so shards hold contiguous
+    runs of samples whose sizes differ by at most one. Writes
+    <stem>-00000-of-0000N.jsonl shards, a <stem>.idx.npy sample index
+    (shard, byte offset, length per sample id; np.load with
+    mmap_mode="r" for O(1) lookups) and a <stem>.shards.json listing the
+    shard files. Everything is written under .tmp names and renamed last.
+    """
+    shards_dir.mkdir(parents=True, exist_ok=True)
+    stem = stage_path.stem
+    n_shards = max(1, min(n_shards, total))
+    names = [f"{stem}-{k:05d}-of-{n_shards:05d}.jsonl" for k in range(n_shards)]
+    index_path = shards_dir / f"{stem}.idx.npy"
+    index_tmp = shards_dir / f"{stem}.idx.tmp.npy"
+
+    index = np.lib.format.open_memmap(
+        index_tmp, mode="w+", dtype=INDEX_DTYPE, shape=(total,)
+    )
+    shard = -1
+    out = None
+    with open(stage_path, "rb") as f:
+        for i, line in enumerate(f):
+            if i >= total:
+                break
+            if i * n_shards // total != shard:
+                if out is not None:
+                    out.close()
+                shard += 1
+                out = open(
+                    shards_dir / f"{names[shard]}.tmp", "wb", buffering=1024 * 1024
+                )
+            index[i] = (shard, out.tell(), len(line))
+            out.write(line)
+    if out is not None:
+        out.close()
+    index.flush()
+    del index
+
+    list_path = shards_dir / f"{stem}.shards.json"
+    list_tmp = shards_dir / f"{stem}.shards.json.tmp"
+    with open(list_tmp, "w", encoding="utf-8") as f:
+        json.dump({"samples": total, "shards": names}, f)
+
+    for name in names:
+        os.replace(shards_dir / f"{name}.tmp", shards_dir / name)
+    os.replace(index_tmp, index_path)
+    os.replace(list_tmp, list_path)
+
+    # Shards left over from a run with a different shard count
+    for old in shards_dir.glob(f"{stem}-*-of-*.jsonl"):
+        if old.name not in names:
+            old.unlink()
+
+
+def remove_stage_shards(shards_dir: Path, stem: str):
+    """Delete the shards and index of a stage file (they no longer match it)"""
+    stale = [shards_dir / f"{stem}.shards.json", shards_dir / f"{stem}.idx.npy"]
+    stale += shards_dir.glob(f"{stem}-*-of-*.jsonl")
+    for path in stale:
+        if path.exists():
+            path.unlink()
+
+
+class SampleIndex:
+    """Random access to sharded stage samples by global sample id
+
+    Usage:
+        samples = SampleIndex("combined/shards", "stage1_pretrain")
+        print(len(samples), samples[123456]["text"])
+    """
+
+    def __init__(self, shards_dir: str, stem: str):
+        self.shards_dir = Path(shards_dir)
+        with open(self.shards_dir / f"{stem}.shards.json", "r", encoding="utf-8") as f:
+            self.shards = json.load(f)["shards"]
+        self.index = np.load(self.shards_dir / f"{stem}.idx.npy", mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, sample_id: int) -> Dict:
+        shard, offset, length = self.index[sample_id].tolist()
+        with open(self.shards_dir / self.shards[shard], "rb") as f:
+            f.seek(offset)
+            return json.loads(f.read(length))
+
+
+def combine_dataset(
+    input_dir: Path,
+    output_dir: Path,
+    add_prefix: bool = False,
+    mode: str = "copy",
+    jobs: int = 1,
+    incremental: bool = True,
+    io_workers: int = 16,
+    shards: int = 0,
+):
+    """Combine all sub-dataset JSONL files into one
+
+    Sessions are read concurrently (jobs worker processes) and streamed
+    into the combined files in sorted session order, so the output is
+    deterministic and memory does not grow with the corpus.
+
+    A state file in the output records each session's content hash and
+    where it ends in every combined file. With incremental, only sessions
+    from the first new, changed or removed one onwards (in sorted order)
+    are re-read and appended; the result is identical to a full rebuild.
+
+    With shards, every stage file is also split into that many balanced
+    shards plus a sample index under combined/shards (see
+    shard_stage_file); these are regenerated from the combined files.
+    """
     output_dir.mkdir(parents=True, exist_ok=True)
 
     # Find all metadata.jsonl files
-    metadata_files = list(input_dir.glob("*/metadata.jsonl"))
+    metadata_files = sorted(input_dir.glob("*/metadata.jsonl"))
 
     if not metadata_files:
         print(f"No metadata.jsonl files found in {input_dir}")
@@ -26,118 +521,123 @@ def combine_dataset(input_dir: Path, output_dir: Path, add_prefix: bool = False)
 
     print(f"Found {len(metadata_files)} datasets")
 
-    # Combine all samples
-    all_samples = []
-    stage1_samples = []
-    stage2_samples = []
-    stage3_samples = []
+    session_dirs = [meta_file.parent for meta_file in metadata_files]
+    state_path = output_dir / STATE_FILE
+    options = {"input": str(input_dir.resolve()), "prefix": add_prefix, "mode": mode}
+    previous = load_state(state_path, options) if incremental else []
+    by_name = {record["name"]: record for record in previous}
+    fingerprints = [
+        session_fingerprint(session_dir, by_name.get(session_dir.name))
+        for session_dir in session_dirs
+    ]
 
-    for meta_file in tqdm(metadata_files, desc="Combining datasets"):
-        dataset_name = meta_file.parent.name
+    # Longest prefix of sessions identical to the last run
+    keep = 0
+    while (
+        keep < min(len(previous), len(session_dirs))
+        and previous[keep]["name"] == session_dirs[keep].name
+        and previous[keep]["hash"] == fingerprints[keep]["hash"]
+    ):
+        keep += 1
+    records = previous[:keep]
+    todo = session_dirs[keep:]
 
-        # Read metadata
-        with open(meta_file, "r", encoding="utf-8") as f:
-            for line in f:
-                sample = json.loads(line)
-                if add_prefix:
-                    sample["image"] = f"{dataset_name}_{sample['image']}"
-                    sample["source"] = dataset_name
-                all_samples.append(sample)
-
-        # Read stage1 pretrain
-        stage1_file = meta_file.parent / "stage1_pretrain.jsonl"
-        if stage1_file.exists():
-            with open(stage1_file, "r", encoding="utf-8") as f:
-                for line in f:
-                    sample = json.loads(line)
-                    # Convert to new format: {"images": ["frames/..."], "text": "..."}
-                    if "image" in sample:
-                        image_filename = sample.pop("image")
-                        sample["images"] = [f"frames/{image_filename}"]
-                    if add_prefix:
-                        sample["images"] = [
-                            f"{dataset_name}/{img}" for img in sample.get("images", [])
-                        ]
-                    stage1_samples.append(sample)
-
-        # Read stage2 instruct
-        stage2_file = meta_file.parent / "stage2_instruct.jsonl"
-        if stage2_file.exists():
-            with open(stage2_file, "r", encoding="utf-8") as f:
-                for line in f:
-                    sample = json.loads(line)
-                    if "image" in sample:
-                        image_filename = sample.pop("image")
-                        sample["images"] = [f"frames/{image_filename}"]
-                    if add_prefix:
-                        sample["images"] = [
-                            f"{dataset_name}/{img}" for img in sample.get("images", [])
-                        ]
-                    stage2_samples.append(sample)
-
-        # Read stage3 reasoning
-        stage3_file = meta_file.parent / "stage3_reasoning.jsonl"
-        if stage3_file.exists():
-            with open(stage3_file, "r", encoding="utf-8") as f:
-                for line in f:
-                    sample = json.loads(line)
-                    if "image" in sample:
-                        image_filename = sample.pop("image")
-                        sample["images"] = [f"frames/{image_filename}"]
-                    if add_prefix:
-                        sample["images"] = [
-                            f"{dataset_name}/{img}" for img in sample.get("images", [])
-                        ]
-                    stage3_samples.append(sample)
+    if keep == len(previous) == len(session_dirs):
+        print("All sessions unchanged since the last combine")
+    elif keep:
+        print(f"Reusing {keep} unchanged sessions, combining {len(todo)}")
+
+    offsets = None
+    if keep:
+        offsets = records[-1]["end"]
+        # Anything past the kept prefix is about to be rewritten
+        save_state(state_path, options, records)
+
+    writers = StageWriters(output_dir, offsets)
+    try:
+        sessions = iter_sessions(todo, add_prefix, mode, jobs)
+        for session_dir, lines in tqdm(
+            sessions, total=len(todo), desc="Combining datasets"
+        ):
+            for output_name, stage_lines in lines.items():
+                writers.write(output_name, stage_lines)
+            records.append(
+                {
+                    "name": session_dir.name,
+                    **fingerprints[len(records)],
+                    "counts": {name: len(lines[name]) for name in lines},
+                    "end": writers.ends(),
+                }
+            )
+    except BaseException:
+        writers.abort()
+        raise
+    writers.close()
+    # Frames are placed after the combined files; until then the new
+    # sessions' frames are pending, so an interrupted copy is resumed
+    for record in records[keep:]:
+        record["frames"] = mode == "manifest"
+    save_state(state_path, options, records)
 
     # Write combined files
-    print(f"\nTotal samples: {len(all_samples)}")
-
-    with open(output_dir / "all_samples.jsonl", "w", encoding="utf-8") as f:
-        for sample in all_samples:
-            f.write(json.dumps(sample, ensure_ascii=False) + "\n")
-
-    if stage1_samples:
-        with open(output_dir / "stage1_pretrain.jsonl", "w", encoding="utf-8") as f:
-            for sample in stage1_samples:
-                f.write(json.dumps(sample, ensure_ascii=False) + "\n")
-        print(f"Stage1: {len(stage1_samples)}")
-
-    if stage2_samples:
-        with open(output_dir / "stage2_instruct.jsonl", "w", encoding="utf-8") as f:
-            for sample in stage2_samples:
-                f.write(json.dumps(sample, ensure_ascii=False) + "\n")
-        print(f"Stage2: {len(stage2_samples)}")
-
-    if stage3_samples:
-        with open(output_dir / "stage3_reasoning.jsonl", "w", encoding="utf-8") as f:
-            for sample in stage3_samples:
-                f.write(json.dumps(sample, ensure_ascii=False) + "\n")
-        print(f"Stage3: {len(stage3_samples)}")
-
-    # Copy frames if they exist
-    frames_dir = input_dir / "frames"
-    if frames_dir.exists():
+    totals = defaultdict(int)
+    for record in records:
+        for output_name, count in record["counts"].items():
+            totals[output_name] += count
+    print(f"\nTotal samples: {totals['all_samples.jsonl']}")
+    for output_name, label in (
+        ("stage1_pretrain.jsonl", "Stage1"),
+        ("stage2_instruct.jsonl", "Stage2"),
+        ("stage3_reasoning.jsonl", "Stage3"),
+    ):
+        if totals[output_name]:
+            print(f"{label}: {totals[output_name]}")
+        if shards > 0 and totals[output_name]:
+            shard_stage_file(
+                output_dir / output_name,
+                output_dir / SHARD_DIR,
+                shards,
+                totals[output_name],
+            )
+            print(f"  sharded into {min(shards, totals[output_name])} files")
+        else:
+            # Shards from an earlier --shards run would describe old data
+            remove_stage_shards(output_dir / SHARD_DIR, Path(output_name).stem)
+
+    # Place frames next to the combined files (manifest mode references
+    # them in place instead). Frames of sessions whose frames an earlier
+    # run placed are already there, and keep their names.
+    if mode != "manifest":
         combined_frames_dir = output_dir / "frames"
-        combined_frames_dir.mkdir(parents=True, exist_ok=True)
-
-        for meta_file in tqdm(metadata_files, desc="Copying frames"):
-            dataset_name = meta_file.parent.name
-            src_frames = meta_file.parent / "frames"
-            if src_frames.exists():
-                for frame in list(src_frames.glob("*.png")) + list(
-                    src_frames.glob("*.jpg")
-                ):
-                    dst_name = (
-                        f"{dataset_name}_{frame.name}" if add_prefix else frame.name
-                    )
-                    dst_path = combined_frames_dir / dst_name
-                    if not dst_path.exists():
-                        import shutil
-
-                        shutil.copy2(frame, dst_path)
-
-        print(f"Frames copied to {combined_frames_dir}")
+        placed = [r.get("frames", False) for r in records]
+        claimed = set()
+        if not add_prefix:
+            for session_dir, done in zip(session_dirs, placed):
+                if done:
+                    claimed.update(_list_frames(session_dir / "frames"))
+        pending = [d for d, done in zip(session_dirs, placed) if not done]
+        methods = transfer_frames(
+            pending, combined_frames_dir, add_prefix, mode, io_workers, claimed
+        )
+        summary = ", ".join(
+            f"{n} {m}"
+            for m, n in sorted(methods.items())
+            if m not in ("failed", "collision")
+        )
+        print(f"Frames placed in {combined_frames_dir} ({summary or 'none new'})")
+        if mode != "copy" and methods.get("copy"):
+            print(f"Warning: {mode} unavailable for some frames, copied instead")
+        if methods.get("collision"):
+            print(
+                f"Warning: {methods['collision']} frames have the same name as "
+                "a frame of an earlier session and were skipped (use --prefix)"
+            )
+        if methods.get("failed"):
+            print(f"Error: {methods['failed']} frames failed size verification")
+        else:
+            for record in records:
+                record["frames"] = True
+            save_state(state_path, options, records)
 
     print(f"\nCombined dataset saved to {output_dir}")
 
@@ -151,6 +651,37 @@ def main():
         action="store_true",
         help="Add dataset name prefix to image filenames",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=min(8, os.cpu_count() or 1),
+        help="Sessions read in parallel worker processes (default: min(8, CPUs))",
+    )
+    parser.add_argument(
+        "--io-workers",
+        type=int,
+        default=16,
+        help="Threads transferring frames (default: 16)",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=0,
+        help="Also split each stage file into N balanced shards with a sample "
+        "index under OUTPUT/shards (default: 0, off)",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Rebuild everything instead of only new or changed sessions",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=MODES,
+        default="copy",
+        help="How frames reach the output: copy, hardlink, reflink, or manifest "
+        "(no frames, paths point at the sessions) (default: copy)",
+    )
 
     args = parser.parse_args()
 
@@ -161,7 +692,16 @@ def main():
         print(f"Error: Input directory {input_dir} does not exist")
         return
 
-    combine_dataset(input_dir, output_dir, args.prefix)
+    combine_dataset(
+        input_dir,
+        output_dir,
+        args.prefix,
+        args.mode,
+        args.jobs,
+        incremental=not args.full,
+        io_workers=args.io_workers,
+        shards=args.shards,
+    )
 
 
 if __name__ == "__main__":
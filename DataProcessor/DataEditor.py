@@ -1,12 +1,407 @@
 import sys
 import os
 import json
+import threading
+from collections import OrderedDict
+import numpy as np
 import pygame
 from pathlib import Path
-import shutil
 import tkinter as tk
 from tkinter import filedialog, simpledialog, messagebox
 
+from npz_cache import read_npz, write_npz
+
+EXPORT_MODES = ["hardlink", "symlink", "copy", "manifest"]
+
+THUMB_SIZE = (160, 90)
+
+# Bump when the metadata offset index layout changes
+INDEX_VERSION = 1
+
+
+def build_line_index(path, block_size=16 * 1024 * 1024):
+    """(starts, ends) byte offsets of every non-blank line in a file"""
+    newlines = []
+    with open(path, "rb") as f:
+        base = 0
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            newlines.append(np.flatnonzero(np.frombuffer(block, np.uint8) == 10) + base)
+            base += len(block)
+    ends = np.concatenate(newlines + [np.zeros(0, np.int64)]).astype(np.int64) + 1
+    if not len(ends) or ends[-1] < base:
+        ends = np.append(ends, base)  # last line without a trailing newline
+    starts = np.concatenate([[0], ends[:-1]]).astype(np.int64)
+    keep = ends - starts > 2  # drop blank lines ("\n" or "\r\n")
+    return starts[keep], ends[keep]
+
+
+def load_line_index(path):
+    """build_line_index, cached in <path>.idx.npz keyed on size and mtime"""
+    stat = os.stat(path)
+    cache = Path(str(path) + ".idx.npz")
+    key = {"version": INDEX_VERSION}
+    data = read_npz(cache, stat, key)
+    if data is not None:
+        return data["starts"], data["ends"]
+
+    starts, ends = build_line_index(path)
+    # A read-only dataset only costs the cache
+    write_npz(cache, stat, key, {"starts": starts, "ends": ends}, warn=False)
+    return starts, ends
+
+
+class LazySamples:
+    """Sequence of metadata.jsonl samples, parsed on demand
+
+    Only a byte-offset index is held for the whole file; samples are read
+    with seek + read under a file lock (safe from any thread, and portable
+    unlike os.pread) and parsed when first accessed, with
+    a small LRU of parsed ones around the cursor. Edits go to an overlay
+    dict and win over the file; assign a changed copy with
+    samples[i] = sample.
+    """
+
+    def __init__(self, path, starts=None, ends=None, overlay=None, cached=4096):
+        self.path = Path(path)
+        if starts is None:
+            starts, ends = load_line_index(self.path)
+        self.starts = starts
+        self.ends = ends
+        self.overlay = overlay if overlay is not None else {}
+        self.cached = cached
+        self._parsed = OrderedDict()
+        self._lock = threading.Lock()
+        self._file = open(self.path, "rb")
+        self._file_lock = threading.Lock()
+
+    def __del__(self):
+        try:
+            self._file.close()
+        except AttributeError:
+            pass
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _read(self, idx):
+        start = int(self.starts[idx])
+        with self._file_lock:
+            self._file.seek(start)
+            data = self._file.read(int(self.ends[idx]) - start)
+        return json.loads(data)
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        with self._lock:
+            if idx in self.overlay:
+                return self.overlay[idx]
+            sample = self._parsed.get(idx)
+            if sample is not None:
+                self._parsed.move_to_end(idx)
+                return sample
+        sample = self._read(idx)
+        with self._lock:
+            self._parsed[idx] = sample
+            if len(self._parsed) > self.cached:
+                self._parsed.popitem(last=False)
+        return sample
+
+    def __setitem__(self, idx, sample):
+        with self._lock:
+            self.overlay[idx] = sample
+            self._parsed.pop(idx, None)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def range_view(self, start, stop):
+        """Samples [start, stop) as their own LazySamples, with a snapshot
+        of the edits in that range"""
+        with self._lock:
+            overlay = {
+                idx - start: dict(sample)
+                for idx, sample in self.overlay.items()
+                if start <= idx < stop
+            }
+        return LazySamples(
+            self.path, self.starts[start:stop], self.ends[start:stop], overlay, 0
+        )
+
+
+def surface_bytes(surface):
+    return surface.get_pitch() * surface.get_height() if surface else 0
+
+
+class SurfaceCache:
+    """LRU cache of surfaces bounded by their pixel memory
+
+    get() counts hits and misses and refreshes recency; contains() and
+    peek() do neither, for bookkeeping that should not skew the stats.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self.entries = OrderedDict()  # key -> surface (None = unreadable)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def contains(self, key):
+        return key in self.entries
+
+    def peek(self, key):
+        return self.entries.get(key)
+
+    def get(self, key):
+        if key not in self.entries:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return True, self.entries[key]
+
+    def put(self, key, surface):
+        if key in self.entries:
+            self.used_bytes -= surface_bytes(self.entries.pop(key))
+        self.entries[key] = surface
+        self.used_bytes += surface_bytes(surface)
+        # Evict least recently used, but always keep the newest entry
+        while self.used_bytes > self.budget_bytes and len(self.entries) > 1:
+            _, old = self.entries.popitem(last=False)
+            self.used_bytes -= surface_bytes(old)
+
+
+def progressive_order(count):
+    """Yield (index, step) covering range(count) coarse to fine
+
+    Every index that is a multiple of step has been yielded once step
+    changes, so a partly built set is still evenly spread.
+    """
+    step = 1 << max(0, (count - 1).bit_length())
+    for idx in range(0, count, step):
+        yield idx, step
+    while step > 1:
+        step //= 2
+        for idx in range(step, count, 2 * step):
+            yield idx, step
+
+
+class ThumbnailAtlas(threading.Thread):
+    """Memory-mapped thumbnails of every frame of a session
+
+    Stored next to the frames as thumbs.u8, a (count, 90, 160, 3) uint8
+    array, and thumbs.json. The header is written once the array is
+    complete; until then a background thread builds it coarse to fine
+    (see progressive_order), so hover previews and the filmstrip show the
+    nearest built thumbnail straight away on long sessions.
+    """
+
+    def __init__(self, frames_dir, filename_of, count):
+        super().__init__(daemon=True)
+        self.frames_dir = Path(frames_dir)
+        self.filename_of = filename_of
+        self.count = count
+        self.data_path = self.frames_dir / "thumbs.u8"
+        self.header_path = self.frames_dir / "thumbs.json"
+        width, height = THUMB_SIZE
+        self.shape = (count, height, width, 3)
+
+        self.built = np.zeros(count, dtype=bool)
+        self.step = 0  # every multiple of step is built (0 = none yet)
+        self.stopped = False
+        self.array = None
+        if self._complete():
+            self.array = np.memmap(
+                self.data_path, dtype=np.uint8, mode="r", shape=self.shape
+            )
+            self.built[:] = True
+            self.step = 1
+
+    def _complete(self):
+        try:
+            with open(self.header_path, "r", encoding="utf-8") as f:
+                header = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return header.get("count") == self.count and header.get("size") == list(
+            THUMB_SIZE
+        )
+
+    def start(self):
+        if self.step != 1:
+            super().start()
+
+    def stop(self):
+        self.stopped = True
+
+    def run(self):
+        if not self.frames_dir.exists():
+            return
+        self.array = np.memmap(
+            self.data_path, dtype=np.uint8, mode="w+", shape=self.shape
+        )
+        level = None
+        for idx, step in progressive_order(self.count):
+            if self.stopped:
+                return
+            if level is not None and step != level:
+                self.step = level  # every multiple of it is built now
+            level = step
+            try:
+                img = pygame.image.load(str(self.frames_dir / self.filename_of(idx)))
+                thumb = pygame.transform.scale(img, THUMB_SIZE)
+                self.array[idx] = np.frombuffer(
+                    pygame.image.tostring(thumb, "RGB"), dtype=np.uint8
+                ).reshape(self.shape[1:])
+            except Exception:
+                pass  # missing/unreadable frames stay black
+            self.built[idx] = True
+        self.step = 1
+        self.array.flush()
+        with open(self.header_path, "w", encoding="utf-8") as f:
+            json.dump({"count": self.count, "size": list(THUMB_SIZE)}, f)
+
+    def nearest(self, idx):
+        """idx, or the closest index whose thumbnail is built, or None"""
+        if self.built[idx]:
+            return idx
+        if not self.step:
+            return None
+        near = int(round(idx / self.step)) * self.step
+        return min(near, (self.count - 1) // self.step * self.step)
+
+    def thumbnail(self, idx):
+        """160x90 surface for sample idx (or the nearest built one)"""
+        idx = self.nearest(idx)
+        if idx is None or self.array is None:
+            return None
+        return pygame.image.frombuffer(self.array[idx].tobytes(), THUMB_SIZE, "RGB")
+
+
+class FramePrefetcher(threading.Thread):
+    """Decodes frames on a background thread, ahead of the cursor
+
+    The main loop reports cursor moves with move() and picks up finished
+    surfaces with get(); it never waits on a decode. The worker always
+    decodes the frame under the cursor first, then frames in the
+    direction of travel (at the same stride for PageUp/PageDown and
+    scrubbing jumps), then a few behind.
+
+    Full frames live in an LRU cache sized by cache_bytes; a thumbnail of
+    every decoded frame goes to a second, much cheaper tier that outlives
+    them, so revisited frames show instantly at low resolution while the
+    full frame is decoded again.
+    """
+
+    def __init__(
+        self,
+        decode,
+        filename_of,
+        count,
+        ahead=12,
+        behind=2,
+        cache_bytes=512 * 1024 * 1024,
+        thumb_bytes=32 * 1024 * 1024,
+    ):
+        super().__init__(daemon=True)
+        self.decode = decode  # filename -> surface, or None if unreadable
+        self.filename_of = filename_of  # sample index -> filename
+        self.count = count
+        self.ahead = ahead
+        self.behind = behind
+
+        self.cache = SurfaceCache(cache_bytes)
+        self.thumbs = SurfaceCache(thumb_bytes)
+        self.frame_bytes = 0  # size of the last decoded frame
+        self.lock = threading.Condition()
+        self.cursor = 0
+        self.step = 1  # last cursor move: sign is direction, size is stride
+        self.stopped = False
+
+    def move(self, idx):
+        with self.lock:
+            if idx != self.cursor:
+                self.step = idx - self.cursor
+                self.cursor = idx
+            self.lock.notify()
+
+    def get(self, filename, count=True):
+        """(ready, surface) for a frame; count=False leaves the stats alone"""
+        with self.lock:
+            if count:
+                return self.cache.get(filename)
+            if self.cache.contains(filename):
+                return True, self.cache.peek(filename)
+            return False, None
+
+    def thumbnail(self, filename):
+        with self.lock:
+            return self.thumbs.peek(filename)
+
+    def stats(self):
+        with self.lock:
+            return (
+                self.cache.hits,
+                self.cache.misses,
+                self.cache.used_bytes,
+                self.thumbs.used_bytes,
+            )
+
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+            self.lock.notify()
+
+    def _plan(self):
+        """Sample indices worth having decoded, most urgent first"""
+        direction = 1 if self.step > 0 else -1
+        plan = [self.cursor]
+        if abs(self.step) > 1:
+            plan += [self.cursor + self.step * k for k in range(1, 5)]
+            plan += [self.cursor + direction * k for k in range(1, 5)]
+        else:
+            plan += [self.cursor + direction * k for k in range(1, self.ahead + 1)]
+        plan += [self.cursor - direction * k for k in range(1, self.behind + 1)]
+        return [i for i in plan if 0 <= i < self.count]
+
+    def _next_wanted(self):
+        # Never plan more than the cache holds, or prefetching would evict
+        # its own frames and decode them again forever
+        capacity = max(1, self.cache.budget_bytes // max(1, self.frame_bytes))
+        for idx in self._plan()[:capacity]:
+            filename = self.filename_of(idx)
+            if not self.cache.contains(filename):
+                return filename
+        return None
+
+    def run(self):
+        while True:
+            with self.lock:
+                filename = self._next_wanted()
+                while filename is None and not self.stopped:
+                    self.lock.wait()
+                    filename = self._next_wanted()
+                if self.stopped:
+                    return
+
+            surface = self.decode(filename)
+            thumb = pygame.transform.scale(surface, THUMB_SIZE) if surface else None
+
+            with self.lock:
+                self.frame_bytes = surface_bytes(surface) or self.frame_bytes
+                self.cache.put(filename, surface)
+                self.thumbs.put(filename, thumb)
+
 
 class DataEditor:
     def __init__(self, dataset_path):
@@ -20,12 +415,9 @@ class DataEditor:
             )
             sys.exit(1)
 
-        self.samples = []
-        with open(self.metadata_path, "r", encoding="utf-8") as f:
-            for line in f:
-                self.samples.append(json.loads(line))
+        self.samples = LazySamples(self.metadata_path)
 
-        if not self.samples:
+        if not len(self.samples):
             messagebox.showerror("Error", "No samples found in metadata")
             sys.exit(1)
 
@@ -44,35 +436,103 @@ class DataEditor:
 
         self.running = True
         self.clock = pygame.time.Clock()
-        self.image_cache = {}
+        self.last_img = None
+        self.looked_up = None  # filename whose lookup was counted
+
+        self.prefetcher = FramePrefetcher(
+            self.decode_image,
+            lambda idx: self.samples[idx]["image"],
+            len(self.samples),
+        )
+        self.prefetcher.start()
+
+        self.atlas = ThumbnailAtlas(
+            self.frames_dir,
+            lambda idx: self.samples[idx]["image"],
+            len(self.samples),
+        )
+        self.atlas.start()
+        self.show_filmstrip = False
+
+        # Background export (see save_dataset)
+        self.export_thread = None
+        self.export_status = None  # progress text while exporting
+        self.export_result = None  # (title, message) once finished
 
         # Hide the root tkinter window
         self.tk_root = tk.Tk()
         self.tk_root.withdraw()
 
-    def load_image(self, filename):
-        if filename in self.image_cache:
-            return self.image_cache[filename]
-
+    def decode_image(self, filename):
+        """Load and scale one frame (runs on the prefetch thread)"""
         path = self.frames_dir / filename
         if not path.exists():
             return None
 
         try:
             img = pygame.image.load(str(path))
-            img = pygame.transform.scale(img, (1280, 720))
-            self.image_cache[filename] = img
-
-            # Simple cache management
-            if len(self.image_cache) > 100:
-                keys = list(self.image_cache.keys())
-                del self.image_cache[keys[0]]
-            return img
+            return pygame.transform.scale(img, (1280, 720))
         except:
             return None
 
+    def load_image(self, filename):
+        """Decoded frame if ready, else its thumbnail scaled up, else the
+        last frame shown"""
+        self.prefetcher.move(self.current_idx)
+        # Count one cache lookup per frame visited, not one per redraw
+        ready, img = self.prefetcher.get(filename, count=filename != self.looked_up)
+        self.looked_up = filename
+        if ready:
+            self.last_img = img
+            return img
+        thumb = self.prefetcher.thumbnail(filename)
+        if thumb is None and self.atlas.built[self.current_idx]:
+            thumb = self.atlas.thumbnail(self.current_idx)
+        if thumb:
+            return pygame.transform.scale(thumb, (1280, 720))
+        return self.last_img
+
+    def bar_index(self, x):
+        """Sample index under x on the progress bar"""
+        x = min(max(x, 0), self.screen_width - 1)
+        return int((x / self.screen_width) * (len(self.samples) - 1))
+
+    def filmstrip_indices(self):
+        """Evenly spaced samples across the whole session, one per slot"""
+        slots = self.screen_width // THUMB_SIZE[0]
+        last = len(self.samples) - 1
+        return [round(k * last / max(1, slots - 1)) for k in range(slots)]
+
+    def draw_filmstrip(self):
+        """Thumbnails across the session along the bottom of the frame"""
+        y = 720 - THUMB_SIZE[1]
+        for slot, idx in enumerate(self.filmstrip_indices()):
+            x = slot * THUMB_SIZE[0]
+            thumb = self.atlas.thumbnail(idx)
+            if thumb:
+                self.screen.blit(thumb, (x, y))
+            if self.start_marker <= idx <= self.end_marker:
+                pygame.draw.rect(
+                    self.screen, (0, 255, 0), (x, y, THUMB_SIZE[0], THUMB_SIZE[1]), 1
+                )
+
+    def draw_hover_preview(self, mouse_x):
+        """Double-size thumbnail above the progress bar at the mouse"""
+        idx = self.bar_index(mouse_x)
+        thumb = self.atlas.thumbnail(idx)
+        if thumb is None:
+            return
+        w, h = THUMB_SIZE[0] * 2, THUMB_SIZE[1] * 2
+        x = min(max(mouse_x - w // 2, 0), self.screen_width - w)
+        y = 720 - h - 8
+        self.screen.blit(pygame.transform.scale(thumb, (w, h)), (x, y))
+        pygame.draw.rect(self.screen, (255, 255, 255), (x, y, w, h), 1)
+        self.screen.blit(
+            self.font.render(str(idx), True, (255, 255, 255)), (x + 4, y + 4)
+        )
+
     def edit_text(self, field):
-        sample = self.samples[self.current_idx]
+        sample = dict(self.samples[self.current_idx])
         current_val = sample.get(field, "")
 
         # Use Tkinter dialog for text entry instead of console
@@ -87,50 +547,117 @@ class DataEditor:
                 sample.pop(field, None)
             else:
                 sample[field] = new_val
+            self.samples[self.current_idx] = sample
 
     def save_dataset(self):
         new_path = self.dataset_path.parent / (self.dataset_path.name + "_edited")
 
-        if messagebox.askyesno(
+        if self.export_thread is not None and self.export_thread.is_alive():
+            messagebox.showinfo("Save", "An export is already running")
+            return
+
+        mode = simpledialog.askstring(
             "Save",
-            f"Save edited dataset to {new_path.name}?\nRange: {self.start_marker} to {self.end_marker}",
-        ):
+            f"Save edited dataset to {new_path.name}?\nRange: {self.start_marker} to {self.end_marker}\n\n"
+            "Frames: " + " / ".join(EXPORT_MODES),
+            initialvalue="hardlink",
+        )
+        if mode is None:
+            return
+        mode = mode.strip().lower()
+        if mode not in EXPORT_MODES:
+            messagebox.showerror("Error", f"Unknown export mode: {mode}")
+            return
+
+        # Snapshot the range so edits made while exporting don't race it
+        new_samples = self.samples.range_view(self.start_marker, self.end_marker + 1)
+        self.export_result = None
+        self.export_thread = threading.Thread(
+            target=self._export,
+            args=(new_path, new_samples, self.start_marker, mode),
+            daemon=True,
+        )
+        self.export_thread.start()
+
+    def _export(self, new_path, new_samples, start, mode):
+        """Write the exported range (runs on the export thread)
+
+        copy/hardlink/symlink place the frames in new_path/frames (hard
+        links fall back to copies across filesystems). manifest writes no
+        frames: range.json names the source session and the [start, end]
+        sample range, and stage1_pretrain.jsonl points at the source frames.
+        """
+        try:
+            # Imported here so the editor itself never depends on DataCombine
+            from DataCombine import transfer_frame
+
             new_path.mkdir(parents=True, exist_ok=True)
             new_frames_dir = new_path / "frames"
-            new_frames_dir.mkdir(parents=True, exist_ok=True)
-
-            new_samples = self.samples[self.start_marker : self.end_marker + 1]
+            if mode != "manifest":
+                new_frames_dir.mkdir(parents=True, exist_ok=True)
 
             # Copy and update
             with open(new_path / "metadata.jsonl", "w", encoding="utf-8") as f:
                 for i, sample in enumerate(new_samples):
+                    self.export_status = f"Exporting {i}/{len(new_samples)}"
                     sample_copy = sample.copy()
                     sample_copy["frame_idx"] = i
                     f.write(json.dumps(sample_copy, ensure_ascii=False) + "\n")
 
+                    if mode == "manifest":
+                        continue
                     src = self.frames_dir / sample["image"]
                     dst = new_frames_dir / sample["image"]
-                    if src.exists() and not dst.exists():
-                        shutil.copy2(src, dst)
+                    if src.exists() and not os.path.lexists(dst):
+                        if mode == "symlink":
+                            os.symlink(src.resolve(), dst)
+                        else:
+                            transfer_frame(src, dst, mode)
 
             # Update stage files
+            if mode == "manifest":
+                image_dir = str(self.frames_dir.resolve())
+                with open(new_path / "range.json", "w", encoding="utf-8") as f:
+                    json.dump(
+                        {
+                            "source": str(self.dataset_path.resolve()),
+                            "start": start,
+                            "end": start + len(new_samples) - 1,
+                        },
+                        f,
+                    )
+            else:
+                image_dir = "frames"
             with open(new_path / "stage1_pretrain.jsonl", "w", encoding="utf-8") as f:
                 for sample in new_samples:
                     out = {
-                        "images": [f"frames/{sample['image']}"],
+                        "images": [f"{image_dir}/{sample['image']}"],
                         "text": sample["action"],
                     }
                     f.write(json.dumps(out, ensure_ascii=False) + "\n")
 
-            messagebox.showinfo(
-                "Success", f"Dataset saved successfully to {new_path.name}"
+            self.export_result = (
+                "Success",
+                f"Dataset saved successfully to {new_path.name} ({mode})",
             )
+        except Exception as e:
+            self.export_result = ("Error", f"Export failed: {e}")
+        self.export_status = None
 
     def run(self):
         while self.running:
             sample = self.samples[self.current_idx]
             img = self.load_image(sample["image"])
 
+            if self.export_result is not None:
+                # Tk dialogs must run on this thread, not the export thread
+                title, message = self.export_result
+                self.export_result = None
+                if title == "Error":
+                    messagebox.showerror(title, message)
+                else:
+                    messagebox.showinfo(title, message)
+
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     self.running = False
@@ -156,6 +683,8 @@ class DataEditor:
                         self.edit_text("instruction")
                     elif event.key == pygame.K_t:
                         self.edit_text("thought")
+                    elif event.key == pygame.K_f:
+                        self.show_filmstrip = not self.show_filmstrip
                     elif event.key == pygame.K_RETURN:
                         if pygame.key.get_mods() & pygame.KMOD_CTRL:
                             self.save_dataset()
@@ -166,14 +695,30 @@ class DataEditor:
                     if (
                         event.pos[1] > 720 and event.pos[1] < 735
                     ):  # Click on progress bar
-                        self.current_idx = int(
-                            (event.pos[0] / self.screen_width) * (len(self.samples) - 1)
-                        )
+                        self.current_idx = self.bar_index(event.pos[0])
+                    elif (
+                        self.show_filmstrip
+                        and 720 - THUMB_SIZE[1] <= event.pos[1] < 720
+                    ):  # Click on a filmstrip thumbnail
+                        slot = event.pos[0] // THUMB_SIZE[0]
+                        indices = self.filmstrip_indices()
+                        if slot < len(indices):
+                            self.current_idx = indices[slot]
 
             self.screen.fill((20, 20, 20))
 
             if img:
                 self.screen.blit(img, (0, 0))
+            if not self.prefetcher.get(sample["image"], count=False)[0]:
+                self.screen.blit(
+                    self.font.render("Loading...", True, (255, 255, 255)), (10, 10)
+                )
+
+            if self.show_filmstrip:
+                self.draw_filmstrip()
+            mouse_x, mouse_y = pygame.mouse.get_pos()
+            if 720 < mouse_y < 735:
+                self.draw_hover_preview(mouse_x)
 
             # UI Panels
             pygame.draw.rect(self.screen, (40, 40, 40), (0, 720, 1280, 130))
@@ -226,14 +771,32 @@ class DataEditor:
                 (10, info_y + 80),
             )
 
+            hits, misses, cache_bytes, thumb_bytes = self.prefetcher.stats()
+            hit_rate = 100 * hits / (hits + misses) if hits + misses else 0
+            self.screen.blit(
+                self.font.render(
+                    f"Cache: {hits} hits / {misses} misses ({hit_rate:.0f}%), "
+                    f"{cache_bytes / 2**20:.0f} MB + {thumb_bytes / 2**20:.0f} MB thumbs",
+                    True,
+                    (150, 150, 150),
+                ),
+                (10, info_y + 100),
+            )
+
+            if self.export_status:
+                self.screen.blit(
+                    self.font.render(self.export_status, True, (255, 200, 0)),
+                    (600, info_y),
+                )
+
             # Controls help
             help_x = 900
             controls = [
                 "Left/Right: Nav",
                 "PgUp/Dn: Fast Nav",
                 "S: Set Start / E: Set End",
-                "I: Edit Instruction",
-                "T: Edit Thought",
+                "I / T: Edit Instruction / Thought",
+                "F: Filmstrip, hover bar: Preview",
                 "Ctrl+Enter: SAVE EXPORT",
             ]
             for i, line in enumerate(controls):
@@ -245,6 +808,8 @@ class DataEditor:
             pygame.display.flip()
             self.clock.tick(60)
 
+        self.prefetcher.stop()
+        self.atlas.stop()
         pygame.quit()
         self.tk_root.destroy()
 
@@ -7,34 +7,46 @@ Usage:
 """
 
 import argparse
+import bisect
+import glob
+import io
+import math
+import multiprocessing
 import os
 import re
 import subprocess
+import tarfile
 import json
-import bisect
 from pathlib import Path
 from collections import defaultdict
 from dataclasses import dataclass, field
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Iterator, Tuple, Optional
 import shutil
+import tempfile
+import threading
+import time
+import traceback
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from functools import lru_cache
+import numpy as np
 from tqdm import tqdm
 
-
-@dataclass
-class KeyChunkEvent:
-    timestamp: int  # 100-nanosecond intervals (FILETIME)
-    keys: List[str]
-
-
-@dataclass
-class MouseEvent:
-    timestamp: int
-    event_type: str  # ABS, REL, WHEEL
-    x: int = 0
-    y: int = 0
-    dx: int = 0
-    dy: int = 0
-    delta: int = 0
+from frame_writers import FRAME_FORMATS, FrameWriter, make_frame_writer
+from keylog import (
+    EventLog,
+    EventLogBuilder,
+    load_event_log,
+    EVENT_KEY_CHUNK,
+    EVENT_MOUSE_REL,
+    EVENT_MOUSE_ABS,
+    EVENT_WHEEL,
+    EVENT_PAUSE,
+    EVENT_RESUME,
+)
+from npz_cache import read_npz, write_npz
+from video_probe import VideoInfo, load_video_info, probe_videos
 
 
 @dataclass
@@ -75,17 +87,120 @@ class ActionFrame:
         return f"<|action_start|>{dx} {dy} {z} ; {' ; '.join(key_parts)}<|action_end|>"
 
 
+@dataclass
+class ActionBatch:
+    """Actions for many frames at once, one row of 6 chunks per frame"""
+
+    dx: np.ndarray  # (frames, 6) int64
+    dy: np.ndarray  # (frames, 6) int64
+    scroll: np.ndarray  # (frames, 6) int64
+    key_ids: np.ndarray  # (frames, 6) int32, -1 if no key chunk yet
+    key_vocab: List[List[str]]
+
+    def __len__(self) -> int:
+        return len(self.dx)
+
+    def frame(self, i: int) -> ActionFrame:
+        """Materialize a single frame as an ActionFrame"""
+        chunks = []
+        for c in range(self.dx.shape[1]):
+            key_id = int(self.key_ids[i, c])
+            chunks.append(
+                ActionChunk(
+                    dx=int(self.dx[i, c]),
+                    dy=int(self.dy[i, c]),
+                    scroll=int(self.scroll[i, c]),
+                    keys=self.key_vocab[key_id] if key_id >= 0 else [],
+                )
+            )
+        return ActionFrame(chunks=chunks)
+
+    def to_lumine_format(self) -> List[str]:
+        """Render every frame, same output as ActionFrame.to_lumine_format"""
+        # np.round rounds half to even, like Python's round()
+        dx = (np.round(self.dx.sum(axis=1) / 5) * 5).astype(np.int64).tolist()
+        dy = (np.round(self.dy.sum(axis=1) / 4) * 4).astype(np.int64).tolist()
+        z = self.scroll.sum(axis=1).tolist()
+
+        # Each chunk can contain up to 4 keys. The trailing "" is what
+        # key id -1 (no key chunk yet) indexes.
+        key_texts = [" ".join(keys[:4]) for keys in self.key_vocab] + [""]
+        key_parts = [
+            " ; ".join([key_texts[k] for k in row]) for row in self.key_ids.tolist()
+        ]
+
+        return [
+            f"<|action_start|>{x} {y} {s} ; {keys}<|action_end|>"
+            for x, y, s, keys in zip(dx, dy, z, key_parts)
+        ]
+
+
+class PauseIndex:
+    """Sorted, merged [pause_start, resume_time) intervals with O(log n) lookups"""
+
+    def __init__(self, ranges: List[Tuple[int, int]]):
+        starts = np.array([r[0] for r in ranges], dtype=np.int64)
+        ends = np.array([r[1] for r in ranges], dtype=np.int64)
+
+        # Drop empty ranges and sort by start
+        valid = starts < ends
+        starts, ends = starts[valid], ends[valid]
+        order = np.argsort(starts, kind="stable")
+        starts, ends = starts[order], ends[order]
+
+        # Merge overlapping/touching ranges: a new interval begins wherever a
+        # start lies past every end seen so far
+        if len(starts):
+            reach = np.maximum.accumulate(ends)
+            new_group = np.ones(len(starts), dtype=bool)
+            new_group[1:] = starts[1:] > reach[:-1]
+            group_starts = np.flatnonzero(new_group)
+            group_ends = np.append(group_starts[1:], len(starts)) - 1
+            starts, ends = starts[group_starts], reach[group_ends]
+
+        self.starts = starts
+        self.ends = ends
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def contains(self, timestamp: int) -> bool:
+        """Check if a timestamp falls within a paused range"""
+        i = int(np.searchsorted(self.starts, timestamp, side="right")) - 1
+        return i >= 0 and timestamp < self.ends[i]
+
+    def mask(self, timestamps: np.ndarray) -> np.ndarray:
+        """Boolean array, True where the timestamp is paused"""
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        idx = np.searchsorted(self.starts, timestamps, side="right") - 1
+        if not len(self.ends):
+            return np.zeros(timestamps.shape, dtype=bool)
+        return (idx >= 0) & (timestamps < self.ends[np.maximum(idx, 0)])
+
+
 class KeyRecorderParser:
     """Parse KeyRecorder log file"""
 
-    def __init__(self, log_path: str):
+    def __init__(self, log_path: str, use_cache: bool = True):
         self.log_path = log_path
-        self.key_chunks: List[KeyChunkEvent] = []
-        self.mouse_events: List[MouseEvent] = []
+        self.use_cache = use_cache  # reuse/write the binary sidecar
         self.start_timestamp: Optional[int] = None
         self.pause_ranges: List[
             Tuple[int, int]
         ] = []  # List of (pause_start, resume_time) tuples
+        self.pause_index = PauseIndex([])
+        self._pause_start: Optional[int] = None  # PAUSE still awaiting RESUME
+        self.skipped_paused = 0  # frames dropped by stream_actions()
+
+        # Columnar event storage, sorted by timestamp (filled by parse())
+        self.key_timestamps = np.empty(0, dtype=np.int64)
+        self.key_ids = np.empty(0, dtype=np.int32)  # index into key_vocab
+        self.key_vocab: List[List[str]] = []  # interned key chunks
+        self.mouse_timestamps = np.empty(0, dtype=np.int64)
+        self.mouse_codes = np.empty(0, dtype=np.int8)  # keylog.EVENT_* code
+        self.mouse_dx = np.empty(0, dtype=np.int32)
+        self.mouse_dy = np.empty(0, dtype=np.int32)
+        self.mouse_delta = np.empty(0, dtype=np.int32)
 
     def parse(self):
         """Parse the log file"""
@@ -93,96 +208,81 @@ class KeyRecorderParser:
             print(f"Error: Log file {self.log_path} not found")
             return self
 
-        pause_start = None
-        with open(self.log_path, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith("#"):
-                    continue
-
-                parts = line.split(",")
-                if len(parts) < 2:
-                    continue
-
-                try:
-                    timestamp = int(parts[0])
-                except ValueError:
-                    continue
-
-                # Set start timestamp
-                if self.start_timestamp is None:
-                    self.start_timestamp = timestamp
-
-                event_type = parts[1]
-
-                # Handle PAUSE/RESUME events
-                if event_type == "PAUSE":
-                    pause_start = timestamp
-                    continue
-                elif event_type == "RESUME":
-                    if pause_start is not None:
-                        self.pause_ranges.append((pause_start, timestamp))
-                        pause_start = None
-                    continue
-
-                if event_type == "KEY_CHUNK":
-                    keys = parts[2].split() if len(parts) > 2 else []
-                    self.key_chunks.append(KeyChunkEvent(timestamp, keys))
-
-                elif event_type == "MOUSE_ABS":
-                    x = int(parts[2]) if len(parts) > 2 else 0
-                    y = int(parts[3]) if len(parts) > 3 else 0
-                    self.mouse_events.append(MouseEvent(timestamp, "ABS", x=x, y=y))
-
-                elif event_type == "MOUSE_REL":
-                    dx = int(parts[2]) if len(parts) > 2 else 0
-                    dy = int(parts[3]) if len(parts) > 3 else 0
-                    evt = MouseEvent(timestamp, "REL", dx=dx, dy=dy)
-                    self.mouse_events.append(evt)
-                    # Debug output for first few REL events
-                    if len(self.mouse_events) <= 5 and (dx != 0 or dy != 0):
-                        print(
-                            f"DEBUG: Parsed MOUSE_REL - timestamp={timestamp}, dx={dx}, dy={dy}, stored event: dx={evt.dx}, dy={evt.dy}"
-                        )
-
-                elif event_type == "MOUSE":
-                    if len(parts) > 2 and parts[2] == "WHEEL":
-                        delta = int(parts[3]) if len(parts) > 3 else 0
-                        self.mouse_events.append(
-                            MouseEvent(timestamp, "WHEEL", delta=delta)
-                        )
-
-        # Handle unclosed pause (pause without resume at end of log)
-        if pause_start is not None:
-            # Set end to a very large timestamp
-            self.pause_ranges.append((pause_start, 2**63 - 1))
-
-        # Sort by timestamp
-        self.key_chunks.sort(key=lambda x: x.timestamp)
-        self.mouse_events.sort(key=lambda x: x.timestamp)
-
-        # Precompute timestamps for binary search
-        self.key_timestamps = [e.timestamp for e in self.key_chunks]
-        self.mouse_timestamps = [e.timestamp for e in self.mouse_events]
+        self._ingest(load_event_log(self.log_path, use_cache=self.use_cache))
+        self._close_pause()
 
         print(
-            f"Parsed {len(self.key_chunks)} key chunks, {len(self.mouse_events)} mouse events, {len(self.pause_ranges)} pause ranges"
+            f"Parsed {len(self.key_timestamps)} key chunks, {len(self.mouse_timestamps)} mouse events, {len(self.pause_ranges)} pause ranges"
         )
         return self
 
+    def _ingest(self, log: EventLog):
+        """Merge a parsed block of the log into the sorted columns"""
+        if self.start_timestamp is None and len(log):
+            self.start_timestamp = int(log.timestamps[0])
+
+        # Pair PAUSE/RESUME events in file order
+        markers = np.flatnonzero(
+            (log.codes == EVENT_PAUSE) | (log.codes == EVENT_RESUME)
+        )
+        for timestamp, code in zip(
+            log.timestamps[markers].tolist(), log.codes[markers].tolist()
+        ):
+            if code == EVENT_PAUSE:
+                self._pause_start = timestamp
+            elif self._pause_start is not None:
+                self.pause_ranges.append((self._pause_start, timestamp))
+                self._pause_start = None
+
+        # Split into key and mouse columns, stable-sorted by timestamp
+        self.key_vocab.extend(
+            keys.split() for keys in log.key_vocab[len(self.key_vocab) :]
+        )
+        key_rows = np.flatnonzero(log.codes == EVENT_KEY_CHUNK)
+        key_timestamps = np.concatenate([self.key_timestamps, log.timestamps[key_rows]])
+        order = np.argsort(key_timestamps, kind="stable")
+        self.key_timestamps = key_timestamps[order]
+        self.key_ids = np.concatenate([self.key_ids, log.key_ids[key_rows]])[order]
+
+        mouse_rows = np.flatnonzero(
+            (log.codes == EVENT_MOUSE_REL)
+            | (log.codes == EVENT_MOUSE_ABS)
+            | (log.codes == EVENT_WHEEL)
+        )
+        mouse_timestamps = np.concatenate(
+            [self.mouse_timestamps, log.timestamps[mouse_rows]]
+        )
+        order = np.argsort(mouse_timestamps, kind="stable")
+        self.mouse_timestamps = mouse_timestamps[order]
+        for name, column in (
+            ("mouse_codes", log.codes),
+            ("mouse_dx", log.dx),
+            ("mouse_dy", log.dy),
+            ("mouse_delta", log.delta),
+        ):
+            merged = np.concatenate([getattr(self, name), column[mouse_rows]])
+            setattr(self, name, merged[order])
+
+    def _close_pause(self):
+        """Handle unclosed pause (pause without resume at end of log)"""
+        if self._pause_start is not None:
+            # Set end to a very large timestamp
+            self.pause_ranges.append((self._pause_start, 2**63 - 1))
+            self._pause_start = None
+        self.pause_index = PauseIndex(self.pause_ranges)
+
     def is_paused(self, timestamp: int) -> bool:
         """Check if a timestamp falls within a paused range"""
-        for pause_start, resume_time in self.pause_ranges:
-            if pause_start <= timestamp < resume_time:
-                return True
-        return False
+        return self.pause_index.contains(timestamp)
+
+    def paused_mask(self, timestamps: np.ndarray) -> np.ndarray:
+        """Vectorized is_paused over a whole frame timeline"""
+        return self.pause_index.mask(timestamps)
 
     def get_actions_at_time(
         self, start_time: int, duration_ms: int = 200
     ) -> ActionFrame:
         """Get actions for a time window (default 200ms for 1 frame at 5fps)"""
-        end_time = start_time + (duration_ms * 10000)
-
         chunk_duration_100ns = int((duration_ms / 6) * 10000)
 
         chunks = []
@@ -191,31 +291,29 @@ class KeyRecorderParser:
             c_end = c_start + chunk_duration_100ns
 
             # Binary search for mouse events in range
-            mouse_start_idx = bisect.bisect_left(self.mouse_timestamps, c_start)
-            mouse_end_idx = bisect.bisect_right(self.mouse_timestamps, c_end - 1)
-
-            dx = dy = scroll = 0
-            rel_count = 0
-            for j in range(mouse_start_idx, mouse_end_idx):
-                e = self.mouse_events[j]
-                if e.event_type == "REL":
-                    dx += e.dx
-                    dy += e.dy
-                    if e.dx != 0 or e.dy != 0:
-                        rel_count += 1
-                elif e.event_type == "WHEEL":
-                    scroll += e.delta
+            lo = np.searchsorted(self.mouse_timestamps, c_start, side="left")
+            hi = np.searchsorted(self.mouse_timestamps, c_end - 1, side="right")
+
+            codes = self.mouse_codes[lo:hi]
+            rel = codes == EVENT_MOUSE_REL
+            rel_dx = self.mouse_dx[lo:hi][rel]
+            rel_dy = self.mouse_dy[lo:hi][rel]
+            dx = int(rel_dx.sum())
+            dy = int(rel_dy.sum())
+            scroll = int(self.mouse_delta[lo:hi][codes == EVENT_WHEEL].sum())
 
             # Debug: show if we found REL events but got 0 movement
-            if rel_count > 0 and dx == 0 and dy == 0 and i == 0:
-                print(
-                    f"WARNING: Found {rel_count} REL events in chunk {i} but total movement is 0"
-                )
+            if i == 0 and dx == 0 and dy == 0:
+                rel_count = int(np.count_nonzero((rel_dx != 0) | (rel_dy != 0)))
+                if rel_count > 0:
+                    print(
+                        f"WARNING: Found {rel_count} REL events in chunk {i} but total movement is 0"
+                    )
 
             # Binary search for key events - find last key before c_end
-            key_idx = bisect.bisect_right(self.key_timestamps, c_end - 1)
+            key_idx = np.searchsorted(self.key_timestamps, c_end - 1, side="right")
             if key_idx > 0:
-                keys = self.key_chunks[key_idx - 1].keys
+                keys = self.key_vocab[self.key_ids[key_idx - 1]]
             else:
                 keys = []
 
@@ -223,6 +321,315 @@ class KeyRecorderParser:
 
         return ActionFrame(chunks=chunks)
 
+    def get_actions_for_frames(
+        self, frame_times: np.ndarray, duration_ms: int = 200
+    ) -> ActionBatch:
+        """Vectorized get_actions_at_time over a whole vector of frame times"""
+        chunk_duration_100ns = int((duration_ms / 6) * 10000)
+        frame_times = np.asarray(frame_times, dtype=np.int64)
+
+        # Chunk boundaries: column i is the start of chunk i, column 6 the end
+        bounds = frame_times[:, None] + (
+            np.arange(7, dtype=np.int64) * chunk_duration_100ns
+        )
+
+        # Prefix sums turn each chunk's sum into a difference of two lookups
+        def prefix(values: np.ndarray) -> np.ndarray:
+            out = np.zeros(len(values) + 1, dtype=np.int64)
+            np.cumsum(values, out=out[1:])
+            return out
+
+        rel = self.mouse_codes == EVENT_MOUSE_REL
+        wheel = self.mouse_codes == EVENT_WHEEL
+        cum_dx = prefix(np.where(rel, self.mouse_dx, 0))
+        cum_dy = prefix(np.where(rel, self.mouse_dy, 0))
+        cum_scroll = prefix(np.where(wheel, self.mouse_delta, 0))
+
+        # Events in [c_start, c_end) for every chunk at once
+        idx = np.searchsorted(self.mouse_timestamps, bounds, side="left")
+        lo, hi = idx[:, :-1], idx[:, 1:]
+
+        # Last key chunk at or before c_end - 1
+        key_idx = (
+            np.searchsorted(self.key_timestamps, bounds[:, 1:] - 1, side="right") - 1
+        )
+        if len(self.key_ids):
+            key_ids = np.where(
+                key_idx >= 0, self.key_ids[np.maximum(key_idx, 0)], -1
+            ).astype(np.int32)
+        else:
+            key_ids = np.full(key_idx.shape, -1, dtype=np.int32)
+
+        return ActionBatch(
+            dx=cum_dx[hi] - cum_dx[lo],
+            dy=cum_dy[hi] - cum_dy[lo],
+            scroll=cum_scroll[hi] - cum_scroll[lo],
+            key_ids=key_ids,
+            key_vocab=self.key_vocab,
+        )
+
+    def stream_actions(
+        self,
+        frame_times: np.ndarray,
+        video_start: int,
+        video_end: int,
+        duration_ms: int = 200,
+        block_size: int = 8 * 1024 * 1024,
+        reorder_window: int = 10000000,
+    ) -> Iterator[Tuple[np.ndarray, List[str]]]:
+        """Parse the log block by block, yielding actions as windows close
+
+        Yields (frame_indices, actions) for frames that pass the overlap and
+        pause filters, as soon as the recorder timestamp has moved past their
+        window (plus reorder_window of slack, in 100ns, for slightly
+        out-of-order lines). Events no pending frame needs are dropped, so
+        memory stays bounded by block_size rather than by the log size.
+        frame_times must be sorted. Paused frames are counted in
+        self.skipped_paused.
+        """
+        frame_times = np.asarray(frame_times, dtype=np.int64)
+        window_100ns = duration_ms * 10000
+        builder = EventLogBuilder()
+        latest = None  # highest recorder timestamp read so far
+        next_frame = 0
+        self.skipped_paused = 0
+
+        with open(self.log_path, "r", encoding="utf-8") as f:
+            while next_frame < len(frame_times):
+                lines = f.readlines(block_size)
+                eof = not lines
+
+                if not eof:
+                    log = builder.feed(lines).drain()
+                    self._ingest(log)
+                    if len(log):
+                        block_latest = int(log.timestamps.max())
+                        latest = (
+                            block_latest
+                            if latest is None
+                            else max(latest, block_latest)
+                        )
+
+                if self.start_timestamp is None:
+                    if eof:
+                        break
+                    continue
+
+                overlap_start = max(video_start, self.start_timestamp)
+                if eof:
+                    # Everything left can be decided now that key_end is known
+                    key_end = (
+                        int(self.key_timestamps[-1])
+                        if len(self.key_timestamps)
+                        else self.start_timestamp
+                    )
+                    overlap_end = min(video_end, key_end)
+                    ready_end = len(frame_times)
+                    self._close_pause()
+                else:
+                    # A frame is final once its window is behind the newest
+                    # timestamp and a later key chunk proves it is before key_end
+                    if not len(self.key_timestamps):
+                        continue
+                    horizon = min(
+                        latest - reorder_window - window_100ns + 1,
+                        int(self.key_timestamps[-1]),
+                    )
+                    overlap_end = video_end
+                    ready_end = int(np.searchsorted(frame_times, horizon, side="left"))
+                    ranges = list(self.pause_ranges)
+                    if self._pause_start is not None:
+                        ranges.append((self._pause_start, 2**63 - 1))
+                    self.pause_index = PauseIndex(ranges)
+
+                if ready_end > next_frame:
+                    times = frame_times[next_frame:ready_end]
+                    in_range = (times >= overlap_start) & (times < overlap_end)
+                    paused = in_range & self.paused_mask(times)
+                    self.skipped_paused += int(np.count_nonzero(paused))
+                    keep = np.flatnonzero(in_range & ~paused)
+
+                    actions = self.get_actions_for_frames(
+                        times[keep], duration_ms=duration_ms
+                    ).to_lumine_format()
+                    yield keep + next_frame, actions
+                    next_frame = ready_end
+
+                if eof:
+                    break
+
+                # Drop events that no pending frame can reach; keep the last
+                # key chunk before the next frame since keys carry forward
+                if next_frame < len(frame_times):
+                    pending = frame_times[next_frame]
+                    cut = int(
+                        np.searchsorted(self.mouse_timestamps, pending, side="left")
+                    )
+                    self.mouse_timestamps = self.mouse_timestamps[cut:]
+                    self.mouse_codes = self.mouse_codes[cut:]
+                    self.mouse_dx = self.mouse_dx[cut:]
+                    self.mouse_dy = self.mouse_dy[cut:]
+                    self.mouse_delta = self.mouse_delta[cut:]
+                    cut = max(
+                        int(np.searchsorted(self.key_timestamps, pending, side="left"))
+                        - 1,
+                        0,
+                    )
+                    self.key_timestamps = self.key_timestamps[cut:]
+                    self.key_ids = self.key_ids[cut:]
+
+
+HWACCELS = ["auto", "cuda", "vaapi", "cpu"]
+VAAPI_DEVICE = "/dev/dri/renderD128"
+
+
+@lru_cache(maxsize=None)
+def probe_hwaccels() -> Tuple[str, ...]:
+    """Decode paths that actually work on this machine, fastest first"""
+    available = []
+    try:
+        listed = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-hwaccels"], capture_output=True, text=True
+        ).stdout.split()
+        filters = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-filters"], capture_output=True, text=True
+        ).stdout
+    except FileNotFoundError:
+        return ("cpu",)
+
+    # Compiled-in support is not enough; make sure a device can be opened
+    candidates = [
+        ("cuda", "scale_cuda", "cuda=hw"),
+        ("vaapi", "scale_vaapi", f"vaapi=hw:{VAAPI_DEVICE}"),
+    ]
+    for name, scaler, device in candidates:
+        if name not in listed or scaler not in filters:
+            continue
+        result = subprocess.run(
+            [
+                "ffmpeg",
+                "-hide_banner",
+                "-v",
+                "error",
+                "-init_hw_device",
+                device,
+                "-f",
+                "lavfi",
+                "-i",
+                "nullsrc=s=64x64",
+                "-frames:v",
+                "1",
+                "-f",
+                "null",
+                "-",
+            ],
+            capture_output=True,
+        )
+        if result.returncode == 0:
+            available.append(name)
+
+    available.append("cpu")
+    return tuple(available)
+
+
+def _is_complete_png(path: Path) -> bool:
+    """True if a PNG exists and ends with its IEND chunk (not cut off)"""
+    try:
+        with open(path, "rb") as f:
+            f.seek(-12, os.SEEK_END)
+            return f.read(12)[4:8] == b"IEND"
+    except OSError:
+        return False
+
+
+# Frames an extraction may fall short of the probed duration x fps
+# (container duration and fps filter rounding)
+FRAME_TOLERANCE = 2
+
+
+class ExtractionManifest:
+    """Progress record of a frame extraction (frames/extract_manifest.json)
+
+    Holds the chunk plan as (first_frame, seek, count) and, for every
+    finished chunk, the size and CRC32 of each of its frames.
+    """
+
+    FILENAME = "extract_manifest.json"
+    VERSION = 1
+
+    def __init__(self, path: Path, key: Optional[Dict] = None):
+        self.path = Path(path)
+        self.key = key
+        self.expected_frames: Optional[int] = None
+        self.chunks: List[List] = []
+        self.done: Dict[str, Dict] = {}
+
+    @classmethod
+    def load(cls, path: Path, key: Optional[Dict] = None) -> "ExtractionManifest":
+        """Load a manifest; a missing one or one for another video/settings
+        (when key is given) starts fresh"""
+        manifest = cls(path, key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return manifest
+
+        if data.get("version") != cls.VERSION or (
+            key is not None and data.get("key") != key
+        ):
+            return manifest
+        manifest.key = data["key"]
+        manifest.expected_frames = data.get("expected_frames")
+        manifest.chunks = data["chunks"]
+        manifest.done = data["done"]
+        return manifest
+
+    def save(self):
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": self.VERSION,
+                    "key": self.key,
+                    "expected_frames": self.expected_frames,
+                    "chunks": self.chunks,
+                    "done": self.done,
+                },
+                f,
+            )
+        os.replace(tmp, self.path)
+
+    def finished(self) -> bool:
+        return bool(self.chunks) and len(self.done) == len(self.chunks)
+
+    def finished_chunks(self) -> List[int]:
+        return sorted(int(i) for i in self.done)
+
+    def chunk_intact(self, i: int, frames_dir: Path, verify: bool = False) -> bool:
+        """Check a finished chunk's frames by size, or by CRC32 with verify"""
+        first_frame = self.chunks[i][0]
+        record = self.done[str(i)]
+        for k, (size, crc) in enumerate(zip(record["sizes"], record["crc32"])):
+            path = frames_dir / f"frame_{first_frame + k:05d}.png"
+            try:
+                if path.stat().st_size != size:
+                    return False
+                if verify and zlib.crc32(path.read_bytes()) != crc:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def frames(self, frames_dir: Path) -> List[Path]:
+        """Paths of every frame in finished chunks, in order"""
+        frames = []
+        for i in self.finished_chunks():
+            first_frame = self.chunks[i][0]
+            for k in range(first_frame, first_frame + self.done[str(i)]["count"]):
+                frames.append(frames_dir / f"frame_{k:05d}.png")
+        return frames
+
 
 class VideoProcessor:
     """Extract frames from video using FFmpeg"""
@@ -234,108 +641,479 @@ class VideoProcessor:
         fps: int = 5,
         width: int = 1280,
         height: int = 720,
+        hwaccel: str = "auto",
+        threads: int = 0,
+        probe_cache: Optional[str] = None,
     ):
         self.video_path = video_path
         self.output_dir = Path(output_dir)
         self.fps = fps
         self.width = width
         self.height = height
+        self.hwaccel = hwaccel  # "auto" until resolve_hwaccel() runs
+        self.threads = threads  # software decode threads, 0 = ffmpeg default
+        self._auto_hwaccel = hwaccel == "auto"
+        self.probe_cache = probe_cache  # video_probe cache dir, None = no cache
+        self._info: Optional[VideoInfo] = None
+
+    def resolve_hwaccel(self) -> str:
+        """Pick the decode path, probing the machine when set to auto"""
+        if self.hwaccel == "auto":
+            self.hwaccel = probe_hwaccels()[0]
+            print(
+                f"Decode path: {self.hwaccel} (available: {', '.join(probe_hwaccels())})"
+            )
+        return self.hwaccel
+
+    def _decode_args(self, start_time: Optional[float] = None) -> Tuple[List[str], str]:
+        """Input options and -vf filter chain for the selected decode path
+
+        start_time pins the fps filter's output grid to an absolute PTS (in
+        seconds), so a segment decoded with -copyts lands on the same frame
+        grid as a full decode.
+        """
+        fps = f"fps={self.fps}"
+        if start_time is not None:
+            fps = f"fps=fps={self.fps}:start_time={start_time:.6f}"
+
+        hwaccel = self.resolve_hwaccel()
+        if hwaccel == "cuda":
+            return (
+                ["-hwaccel", "cuda", "-hwaccel_output_format", "cuda"],
+                f"{fps},scale_cuda={self.width}:{self.height},hwdownload,format=nv12",
+            )
+        if hwaccel == "vaapi":
+            return (
+                [
+                    "-hwaccel",
+                    "vaapi",
+                    "-hwaccel_output_format",
+                    "vaapi",
+                    "-vaapi_device",
+                    VAAPI_DEVICE,
+                ],
+                f"{fps},scale_vaapi=w={self.width}:h={self.height},hwdownload,format=nv12",
+            )
+        # Multithreaded software decode, swscale resize
+        return (
+            ["-threads", str(self.threads)],
+            f"{fps},scale={self.width}:{self.height}:flags=bicubic",
+        )
 
-    def extract_frames(self) -> List[Path]:
-        """Extract frames at specified fps and resolution"""
-        self.output_dir.mkdir(parents=True, exist_ok=True)
+    def _fall_back_to_cpu(self) -> bool:
+        """After a hardware decode failure in auto mode, retry on the CPU"""
+        if self._auto_hwaccel and self.hwaccel != "cpu":
+            print(f"{self.hwaccel} decode failed, falling back to cpu")
+            self.hwaccel = "cpu"
+            return True
+        return False
 
-        # Check if frames already exist
-        existing_frames = sorted(self.output_dir.glob("frame_*.png"))
-        if existing_frames:
-            print(f"Found {len(existing_frames)} existing frames, skipping extraction")
-            return existing_frames
+    def benchmark(self, seconds: float = 20.0) -> Dict[str, float]:
+        """Output frames/sec of each available decode path on the first N seconds"""
+        results = {}
+        configured = self.hwaccel
+        for hwaccel in probe_hwaccels():
+            self.hwaccel = hwaccel
+            input_args, vf = self._decode_args()
+            cmd = (
+                ["ffmpeg", "-hide_banner", "-v", "error"]
+                + input_args
+                + ["-t", str(seconds), "-i", self.video_path, "-vf", vf]
+                + ["-f", "null", "-"]
+            )
+            start = time.perf_counter()
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            elapsed = time.perf_counter() - start
+            if result.returncode != 0:
+                print(f"{hwaccel}: failed ({result.stderr.strip()[:200]})")
+                continue
+            results[hwaccel] = seconds * self.fps / elapsed
+            print(
+                f"{hwaccel}: {results[hwaccel]:.1f} frames/s ({seconds / elapsed:.1f}x realtime)"
+            )
+        self.hwaccel = configured
+        return results
 
-        cmd = [
-            "ffmpeg",
-            "-hwaccel",
-            "cuda",
-            "-hwaccel_output_format",
-            "cuda",
-            "-i",
-            self.video_path,
-            "-vf",
-            f"fps=5,scale_cuda={self.width}:{self.height},hwdownload,format=nv12",
-            "-c:v",
-            "png",
-            "-start_number",
-            "0",
-            "-y",
-            str(self.output_dir / "frame_%05d.png"),
-        ]
+    def _run_extract(
+        self,
+        output_dir: Path,
+        start_number: int = 0,
+        seek: Optional[float] = None,
+        start_time: Optional[float] = None,
+        max_frames: Optional[int] = None,
+    ) -> bool:
+        """Run one ffmpeg PNG extraction into output_dir, True on success
+
+        seek is an input offset in seconds from the start of the file; with
+        it set, timestamps are kept absolute (-copyts) so start_time can
+        align the output to the full-video frame grid.
+        """
+        while True:
+            input_args, vf = self._decode_args(start_time)
+            cmd = ["ffmpeg"] + input_args
+            if seek is not None:
+                cmd += ["-ss", f"{seek:.6f}", "-copyts"]
+            cmd += ["-i", self.video_path, "-vf", vf]
+            if max_frames is not None:
+                cmd += ["-frames:v", str(max_frames)]
+            cmd += ["-c:v", "png", "-start_number", str(start_number), "-y"]
+            cmd += [str(output_dir / "frame_%05d.png")]
+
+            print(f"Extracting frames: {' '.join(cmd)}")
+
+            try:
+                # Every ffmpeg process (one per running segment) takes a slot
+                with ffmpeg_slot():
+                    result = subprocess.run(cmd, capture_output=True, text=True)
+            except FileNotFoundError:
+                print("Error: ffmpeg not found.")
+                return False
+
+            if result.returncode == 0:
+                return True
+            print(f"FFmpeg error: {result.stderr}")
+            if not self._fall_back_to_cpu():
+                return False
+
+    def _manifest_key(self) -> Dict:
+        """What an extraction manifest must match to be reused"""
+        stat = os.stat(self.video_path)
+        return {
+            "video": Path(self.video_path).name,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "fps": self.fps,
+            "width": self.width,
+            "height": self.height,
+        }
+
+    def existing_frames(self) -> List[Path]:
+        """Frames of a finished extraction (manifest), else whatever PNGs exist"""
+        manifest_path = self.output_dir / ExtractionManifest.FILENAME
+        if manifest_path.exists():
+            manifest = ExtractionManifest.load(manifest_path)
+            return manifest.frames(self.output_dir) if manifest.finished() else []
+        return sorted(self.output_dir.glob("frame_*.png"))
+
+    def extract_frames(
+        self, segments: int = 1, chunk_frames: int = 0, verify: bool = False
+    ) -> List[Path]:
+        """Extract frames at specified fps and resolution
+
+        Work is planned as `segments` keyframe-aligned chunks (one plain
+        ffmpeg run by default), or with chunk_frames as chunks of about
+        that many frames, run `segments` at a time. Each finished chunk is
+        recorded in extract_manifest.json with per-frame sizes and CRC32s;
+        anything else on disk is untrusted, so an interrupted extraction
+        resumes from the last good frame instead of being silently reused.
+        verify re-checks every recorded checksum instead of only sizes.
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
 
-        print(f"Extracting frames: {' '.join(cmd)}")
+        manifest = ExtractionManifest.load(
+            self.output_dir / ExtractionManifest.FILENAME, self._manifest_key()
+        )
+        if not manifest.chunks:
+            # New plan (first run, or the video or settings changed): frames
+            # already on disk are not from it, so none are resumed from
+            stale = sorted(self.output_dir.glob("frame_*.png"))
+            if stale:
+                print(f"Removing {len(stale)} frames without a matching manifest")
+                for path in stale:
+                    path.unlink()
+
+            start_100ns, end_100ns = self.get_video_info()
+            expected = (end_100ns - start_100ns) * self.fps // 10000000
+            pieces = segments
+            if chunk_frames > 0:
+                pieces = max(segments, math.ceil(expected / chunk_frames))
+            manifest.chunks = [list(c) for c in self.plan_segments(pieces)]
+            manifest.expected_frames = int(expected)
+            manifest.save()
+
+        # Finished chunks whose frames changed on disk must be redone
+        for i in manifest.finished_chunks():
+            if not manifest.chunk_intact(i, self.output_dir, verify=verify):
+                print(f"Frames of chunk {i} changed on disk, re-extracting")
+                manifest.done.pop(str(i))
+
+        pending = [
+            i for i in range(len(manifest.chunks)) if str(i) not in manifest.done
+        ]
+        if not pending:
+            frames = manifest.frames(self.output_dir)
+            print(f"Found {len(frames)} existing frames, skipping extraction")
+            return frames
+        if manifest.done:
+            print(
+                f"Resuming extraction: {len(pending)}/{len(manifest.chunks)} chunks left"
+            )
 
-        try:
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode != 0:
-                print(f"FFmpeg error: {result.stderr}")
+        # Probe once up front instead of racing from every worker
+        self.resolve_hwaccel()
+        lock = threading.Lock()
+
+        def run(i: int) -> bool:
+            record = self._extract_chunk(manifest, i)
+            if record is None:
+                return False
+            with lock:
+                manifest.done[str(i)] = record
+                manifest.save()
+            return True
+
+        with ThreadPoolExecutor(max_workers=max(1, segments)) as pool:
+            if not all(pool.map(run, pending)):
                 return []
-        except FileNotFoundError:
-            print("Error: ffmpeg not found.")
-            return []
 
-        frames = sorted(self.output_dir.glob("frame_*.png"))
+        frames = manifest.frames(self.output_dir)
         print(f"Extracted {len(frames)} frames")
 
         return frames
 
-    def get_video_info(self) -> Tuple[int, int]:
-        """Get video start and end timestamps in 100ns units"""
-        cmd = [
-            "ffprobe",
-            "-v",
-            "error",
-            "-select_streams",
-            "v:0",
-            "-show_entries",
-            "stream=start_time",
-            "-of",
-            "csv=p=0",
-            self.video_path,
-        ]
+    def _extract_chunk(self, manifest: "ExtractionManifest", i: int) -> Optional[Dict]:
+        """Extract (or finish) one planned chunk, returning its manifest record"""
+        first_frame, seek, count = manifest.chunks[i]
+        end = None if count is None else first_frame + count
+        start_100ns, _ = self.get_video_info()
+        t0 = start_100ns / 10000000
+
+        # Resume after the last complete frame a previous run left behind
+        resume = first_frame
+        while (end is None or resume < end) and _is_complete_png(
+            self.output_dir / f"frame_{resume:05d}.png"
+        ):
+            resume += 1
+        if end is None and resume > first_frame:
+            # The tail chunk has no known end, so its last frame proves nothing
+            resume -= 1
+
+        if end is None or resume < end:
+            if resume != first_frame:
+                print(f"Chunk {i}: resuming at frame {resume}")
+                # Seek one frame early so the fps filter sees its neighbour
+                seek = max(0.0, (resume - 1) / self.fps)
+            if not self._run_extract(
+                self.output_dir,
+                start_number=resume,
+                seek=seek,
+                start_time=None if seek is None else t0 + resume / self.fps,
+                max_frames=None if end is None else end - resume,
+            ):
+                return None
+
+        produced = first_frame
+        while (end is None or produced < end) and (
+            self.output_dir / f"frame_{produced:05d}.png"
+        ).exists():
+            produced += 1
+        if produced == first_frame:
+            print(f"Error: chunk {i} at frame {first_frame} produced no frames")
+            return None
+
+        # The tail chunk runs to the end of the video, so only the total
+        # frame count (from the probed duration) shows it was cut short
+        expected = manifest.expected_frames
+        if end is None and expected and produced < expected - FRAME_TOLERANCE:
+            print(
+                f"Error: chunk {i} ended at frame {produced}, "
+                f"expected about {expected} frames"
+            )
+            return None
+
+        # A bounded chunk must cover exactly its frame numbers: the chunk
+        # is decoded past its end keyframe, so a short one means a late
+        # seek or a decode error, and any stand-in frame would be paired
+        # with the wrong actions
+        if end is not None and produced < end:
+            print(
+                f"Error: chunk {i} at frame {first_frame} produced "
+                f"{produced - first_frame}/{count} frames"
+            )
+            return None
+
+        sizes, checksums = [], []
+        for k in range(first_frame, produced):
+            data = (self.output_dir / f"frame_{k:05d}.png").read_bytes()
+            sizes.append(len(data))
+            checksums.append(zlib.crc32(data))
+        return {"count": produced - first_frame, "sizes": sizes, "crc32": checksums}
+
+    @property
+    def info(self) -> VideoInfo:
+        """Combined ffprobe metadata, probed (or loaded from cache) once"""
+        if self._info is None:
+            self._info = load_video_info(self.video_path, self.probe_cache)
+        return self._info
+
+    def get_keyframe_times(self) -> List[float]:
+        """Sorted keyframe PTS (seconds) from a packet-level probe, no decoding"""
+        return self.info.keyframe_times()
+
+    def frame_pts(self, count: int) -> np.ndarray:
+        """Presentation time (100ns, video timeline) of each sampled frame
+
+        Replays the fps filter's choice over the probed packet PTS: output
+        frame k shows the last source frame whose PTS rounds to slot k or
+        earlier on the fps grid. On variable-frame-rate captures this is
+        the capture time of what the frame actually shows, where
+        start + k * interval drifts. Slots past the last source frame (the
+        filter repeating it up to the end) and videos that cannot be
+        probed fall back to the grid. Cached in frame_pts.npz next to the
+        frames, keyed on the video's size and mtime.
+        """
+        cache = self.output_dir / "frame_pts.npz"
+        stat = os.stat(self.video_path)
+        key = {"fps": self.fps}
+        data = read_npz(cache, stat, key)
+        if data is not None and len(data["pts"]) == count:
+            return data["pts"]
+
+        interval = 10000000 // self.fps
+        slots = np.arange(count, dtype=np.int64)
+        source = self.info.packet_pts
+        if len(source):
+            origin = source[0]
+            # fps rounds timestamps to the nearest slot, halves away from zero
+            source_slots = np.floor((source - origin) * self.fps + 0.5 + 1e-9)
+            shown = np.searchsorted(source_slots, slots, side="right") - 1
+            pts = np.rint(source[np.maximum(shown, 0)] * 10000000).astype(np.int64)
+            past_end = slots > source_slots[-1]
+            origin_100ns = int(round(origin * 10000000))
+            pts[past_end] = origin_100ns + slots[past_end] * interval
+        else:
+            # Not cached, so a later run with a working ffprobe redoes it
+            start_100ns, _ = self.get_video_info()
+            return start_100ns + slots * interval
+
+        write_npz(cache, stat, key, {"pts": pts})
+        return pts
+
+    def plan_segments(
+        self, segments: int
+    ) -> List[Tuple[int, Optional[float], Optional[int]]]:
+        """Split the video at keyframes into (start_number, seek, frame_count)
+
+        Segment boundaries are snapped to the keyframe at or before each
+        equal-duration cut and expressed as output frame indices on the
+        fps grid, so every segment knows exactly which frame_%05d numbers
+        it owns. The last segment's frame_count is None (until the end).
+        """
+        start_100ns, end_100ns = self.get_video_info()
+        t0 = start_100ns / 10000000
+        duration = (end_100ns - start_100ns) / 10000000
+        keyframes = self.get_keyframe_times()
+        if duration <= 0 or not keyframes:
+            return [(0, None, None)]
+
+        # First frame index owned by each cut -> keyframe to seek to
+        cuts: Dict[int, float] = {}
+        for j in range(1, segments):
+            target = t0 + duration * j / segments
+            i = bisect.bisect_right(keyframes, target) - 1
+            if i < 0 or keyframes[i] <= t0:
+                continue
+            first_frame = math.ceil((keyframes[i] - t0) * self.fps - 1e-6)
+            cuts.setdefault(first_frame, keyframes[i])
+
+        starts = [0] + sorted(cuts)
+        plan = []
+        for j, first_frame in enumerate(starts):
+            seek = None if first_frame == 0 else cuts[first_frame] - t0
+            count = starts[j + 1] - first_frame if j + 1 < len(starts) else None
+            plan.append((first_frame, seek, count))
+        return plan
+
+    def iter_raw_frames(self) -> Iterator[bytes]:
+        """Decode the video through a pipe, yielding raw RGB24 frames"""
+        input_args, vf = self._decode_args()
+        cmd = (
+            ["ffmpeg"]
+            + input_args
+            + ["-i", self.video_path, "-vf", vf]
+            + ["-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1"]
+        )
 
-        try:
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            start_sec = float(result.stdout.strip())
-            start_100ns = int(start_sec * 10000000)
-        except (FileNotFoundError, ValueError):
-            start_100ns = 0
-
-        cmd = [
-            "ffprobe",
-            "-v",
-            "error",
-            "-show_entries",
-            "format=duration",
-            "-of",
-            "default=noprint_wrappers=1:nokey=1",
-            self.video_path,
-        ]
+        print(f"Decoding frames: {' '.join(cmd)}")
 
-        try:
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            duration_sec = float(result.stdout.strip())
-            duration_100ns = int(duration_sec * 10000000)
-            end_100ns = start_100ns + duration_100ns
-        except (FileNotFoundError, ValueError):
-            end_100ns = 0
+        frame_size = self.width * self.height * 3
+        with tempfile.TemporaryFile() as stderr:
+            try:
+                proc = subprocess.Popen(
+                    cmd,
+                    stdout=subprocess.PIPE,
+                    stderr=stderr,
+                    bufsize=frame_size * 4,
+                )
+            except FileNotFoundError:
+                print("Error: ffmpeg not found.")
+                return
+
+            try:
+                while True:
+                    frame = proc.stdout.read(frame_size)
+                    if len(frame) < frame_size:
+                        break
+                    yield frame
+            finally:
+                proc.stdout.close()
+                if proc.wait() != 0:
+                    stderr.seek(0)
+                    raise RuntimeError(
+                        f"FFmpeg error: {stderr.read().decode(errors='replace')}"
+                    )
+
+    def decode_frames(self, writer: FrameWriter) -> List[Path]:
+        """Extract frames without a PNG round-trip, straight into a writer"""
+        existing_frames = writer.existing_frames()
+        if existing_frames:
+            print(f"Found {len(existing_frames)} existing frames, skipping extraction")
+            return existing_frames
 
-        return start_100ns, end_100ns
+        while True:
+            try:
+                with writer:
+                    for frame in tqdm(self.iter_raw_frames(), desc="Decoding frames"):
+                        writer.write(frame)
+                    frames = writer.close()
+                break
+            except RuntimeError as e:
+                print(e)
+                # The writer starts over when entered again
+                if not self._fall_back_to_cpu():
+                    return []
+
+        print(f"Extracted {len(frames)} frames")
+        return frames
+
+    def get_video_info(self) -> Tuple[int, int]:
+        """Get video start and end timestamps in 100ns units"""
+        return self.info.start_100ns, self.info.end_100ns
 
 
 class LumineDataset:
-    """Create Lumine-compatible dataset"""
+    """Create Lumine-compatible dataset
 
-    def __init__(self, output_dir: str):
+    Samples are streamed into metadata.jsonl and stage1_pretrain.jsonl as
+    they are added, in buffered batches, so memory stays flat however long
+    the session is. Both files are written under a temporary name and only
+    renamed into place by save(); a crash or abort() leaves any previous
+    output untouched and no half-written files behind.
+    """
+
+    OUTPUTS = ("metadata.jsonl", "stage1_pretrain.jsonl")
+
+    def __init__(self, output_dir: str, batch_size: int = 1000):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
-        self.samples: List[Dict] = []
+        self.batch_size = batch_size
+        self.count = 0
+        self._files = None
+        self._metadata: List[str] = []
+        self._pretrain: List[str] = []
+
+    def _tmp_path(self, name: str) -> Path:
+        return self.output_dir / f"{name}.tmp"
 
     def add_sample(
         self,
@@ -346,35 +1124,376 @@ class LumineDataset:
         thought: Optional[str] = None,
     ):
         """Add a training sample"""
-        sample = {"frame_idx": frame_idx, "image": frame_path.name, "action": action}
+        metadata_entry = {"file_name": frame_path.name, "text": action}
+        self._metadata.append(json.dumps(metadata_entry, ensure_ascii=False) + "\n")
+
+        # Stage 1: Pretrain (image -> action)
+        out = {"images": [f"frames/{frame_path.name}"], "text": action}
+        self._pretrain.append(json.dumps(out, ensure_ascii=False) + "\n")
+
+        self.count += 1
+        if len(self._metadata) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if self._files is None:
+            self._files = [
+                open(self._tmp_path(name), "w", encoding="utf-8")
+                for name in self.OUTPUTS
+            ]
+        metadata_f, pretrain_f = self._files
+        metadata_f.writelines(self._metadata)
+        pretrain_f.writelines(self._pretrain)
+        self._metadata = []
+        self._pretrain = []
+
+    def save(self):
+        """Save dataset metadata"""
+        self._flush()
+        for f in self._files:
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+        self._files = None
+        for name in self.OUTPUTS:
+            os.replace(self._tmp_path(name), self.output_dir / name)
+
+    def abort(self):
+        """Discard everything written since the dataset was opened"""
+        self._metadata = []
+        self._pretrain = []
+        if self._files is not None:
+            for f in self._files:
+                f.close()
+            self._files = None
+        for name in self.OUTPUTS:
+            try:
+                os.remove(self._tmp_path(name))
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
 
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None or self._files is not None:
+            # Left without save(): an error or an early return
+            self.abort()
+
+
+class LumineShardDataset:
+    """Write samples straight into WebDataset tar shards
+
+    Each sample is KEY.<image ext> (the frame bytes), KEY.txt (the action)
+    and KEY.json (source frame and session), with KEY = <session>_<frame
+    index>. Shards are named <session>-000000.tar, -000001.tar, ... in the
+    shard directory, so names depend only on the session and sample
+    order, and member headers carry no timestamps or owners. Like
+    LumineDataset, shards are written under a temporary name and only
+    renamed into place (replacing the session's previous shards) by save().
+    """
+
+    def __init__(self, shard_dir: str, session: str, shard_size: int = 1000):
+        self.shard_dir = Path(shard_dir)
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+        self.session = session
+        self.shard_size = shard_size
+        self.count = 0
+        self._tar: Optional[tarfile.TarFile] = None
+        self._shards: List[Path] = []
+
+    def _add_member(self, name: str, data: bytes):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        self._tar.addfile(info, io.BytesIO(data))
+
+    def add_sample(
+        self,
+        frame_idx: int,
+        frame_path: Path,
+        action: str,
+        instruction: Optional[str] = None,
+        thought: Optional[str] = None,
+    ):
+        """Add a training sample"""
+        if self.count % self.shard_size == 0:
+            if self._tar is not None:
+                self._tar.close()
+            shard = self.shard_dir / f"{self.session}-{len(self._shards):06d}.tar"
+            self._shards.append(shard)
+            self._tar = tarfile.open(shard.with_name(shard.name + ".tmp"), "w")
+
+        key = f"{self.session}_{frame_idx:06d}"
+        meta = {"session": self.session, "file_name": frame_path.name, "text": action}
         if instruction:
-            sample["instruction"] = instruction
+            meta["instruction"] = instruction
         if thought:
-            sample["thought"] = thought
+            meta["thought"] = thought
 
-        self.samples.append(sample)
+        ext = frame_path.suffix.lstrip(".").lower()
+        self._add_member(f"{key}.{ext}", frame_path.read_bytes())
+        self._add_member(f"{key}.txt", action.encode("utf-8"))
+        self._add_member(
+            f"{key}.json", json.dumps(meta, ensure_ascii=False).encode("utf-8")
+        )
+        self.count += 1
 
     def save(self):
-        """Save dataset metadata"""
-        with open(self.output_dir / "metadata.jsonl", "w", encoding="utf-8") as f:
-            for sample in self.samples:
-                metadata_entry = {
-                    "file_name": sample["image"],
-                    "text": sample["action"],
-                }
-                f.write(json.dumps(metadata_entry, ensure_ascii=False) + "\n")
+        """Finalize the shards, replacing this session's previous ones"""
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+        keep = {shard.name for shard in self._shards}
+        for old in self.shard_dir.glob(f"{glob.escape(self.session)}-*.tar"):
+            if old.name not in keep and re.fullmatch(
+                re.escape(self.session) + r"-\d{6}\.tar", old.name
+            ):
+                old.unlink()
+        for shard in self._shards:
+            os.replace(shard.with_name(shard.name + ".tmp"), shard)
+        self._shards = []
+
+    def abort(self):
+        """Discard the shards written so far"""
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+        for shard in self._shards:
+            try:
+                os.remove(shard.with_name(shard.name + ".tmp"))
+            except OSError:
+                pass
+        self._shards = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None or self._shards:
+            self.abort()
 
-        # Stage 1: Pretrain (image -> action)
-        with open(
-            self.output_dir / "stage1_pretrain.jsonl", "w", encoding="utf-8"
-        ) as f:
-            for sample in self.samples:
-                out = {
-                    "images": [f"frames/{sample['image']}"],
-                    "text": sample["action"],
-                }
-                f.write(json.dumps(out, ensure_ascii=False) + "\n")
+
+# Shared ffprobe cache directory, relative to --output
+PROBE_CACHE = ".probe_cache"
+
+# Sample shards of --output-format wds, relative to --output
+SHARD_DIR = "shards"
+
+# Bounds concurrent ffmpeg jobs across worker processes (see _init_worker)
+_ffmpeg_slots = None
+
+
+def _init_worker(ffmpeg_slots):
+    global _ffmpeg_slots
+    _ffmpeg_slots = ffmpeg_slots
+
+
+@contextmanager
+def ffmpeg_slot():
+    """Hold one of the shared ffmpeg slots, if a limit is configured"""
+    if _ffmpeg_slots is None:
+        yield
+        return
+    with _ffmpeg_slots:
+        yield
+
+
+def process_session(log_f: Path, video_f: Path, output_base: Path, args) -> Dict:
+    """Parse, extract, align and save one log/video pair"""
+    stats = {"session": log_f.stem, "status": "failed"}
+
+    if not video_f.exists():
+        stats["status"] = "skipped"
+        stats["reason"] = "video not found"
+        return stats
+
+    print(f"\nProcessing: {log_f.name}")
+    output_dir = output_base / log_f.stem
+
+    parser_obj = KeyRecorderParser(str(log_f), use_cache=not args.no_log_cache)
+    if not args.stream:
+        parser_obj.parse()
+
+    video_proc = VideoProcessor(
+        str(video_f),
+        str(output_dir / "frames"),
+        fps=args.fps,
+        width=args.width,
+        height=args.height,
+        hwaccel=args.hwaccel,
+        threads=args.decode_threads,
+        probe_cache=None if args.no_probe_cache else str(output_base / PROBE_CACHE),
+    )
+
+    writer = None
+    if args.engine == "pipe":
+        writer = make_frame_writer(
+            args.frame_format,
+            str(output_dir / "frames"),
+            args.width,
+            args.height,
+            quality=args.quality,
+            shard_size=args.shard_size,
+        )
+
+    frames = []
+    if not args.skip_video:
+        if writer is not None:
+            with ffmpeg_slot():
+                frames = video_proc.decode_frames(writer)
+        else:
+            # Takes a slot per ffmpeg process, so --segments count too
+            frames = video_proc.extract_frames(
+                segments=args.segments,
+                chunk_frames=args.chunk_frames,
+                verify=args.verify_frames,
+            )
+    elif writer is not None:
+        frames = writer.existing_frames()
+    else:
+        frames = video_proc.existing_frames()
+
+    if not frames:
+        stats["status"] = "skipped"
+        stats["reason"] = "no frames"
+        return stats
+
+    # Frame PTS are on the video's own timeline; anchor it to absolute
+    # FILETIME with the file creation time
+    video_ctime = os.path.getctime(str(video_f))
+    video_ctime_filetime = int(video_ctime * 10000000) + 116444736000000000
+    frame_times = video_ctime_filetime + video_proc.frame_pts(len(frames))
+
+    # Video spans from its first frame to one interval past its last
+    frame_interval_100ns = 10000000 // args.fps
+    video_abs_start = int(frame_times[0])
+    video_abs_end = int(frame_times[-1]) + frame_interval_100ns
+
+    print(
+        f"Video: [{video_abs_start}, {video_abs_end}] ({video_abs_start / 10000000:.2f}s - {video_abs_end / 10000000:.2f}s Unix)"
+    )
+
+    if args.output_format == "wds":
+        dataset = LumineShardDataset(
+            str(output_base / SHARD_DIR), log_f.stem, shard_size=args.shard_size
+        )
+    else:
+        dataset = LumineDataset(str(output_dir))
+
+    with dataset:
+        valid_count = 0
+
+        if args.stream:
+            # Overlap and pause filtering happen window by window as the
+            # log is read, so the whole log is never held in memory
+            windows = parser_obj.stream_actions(
+                frame_times, video_abs_start, video_abs_end, duration_ms=200
+            )
+            for frame_indices, actions in tqdm(windows, desc="Processing windows"):
+                for i, action in zip(frame_indices.tolist(), actions):
+                    dataset.add_sample(
+                        frame_idx=valid_count, frame_path=frames[i], action=action
+                    )
+                    valid_count += 1
+            skipped_paused = parser_obj.skipped_paused
+
+            if valid_count == 0 and skipped_paused == 0:
+                print("Warning: No overlapping time range")
+                stats["status"] = "skipped"
+                stats["reason"] = "no overlap"
+                return stats
+        else:
+            # Key recorder time range
+            key_start = parser_obj.start_timestamp if parser_obj.start_timestamp else 0
+            key_end = (
+                int(parser_obj.key_timestamps[-1])
+                if len(parser_obj.key_timestamps)
+                else key_start
+            )
+
+            # Find overlap between video and key timestamps
+            overlap_start = max(video_abs_start, key_start)
+            overlap_end = min(video_abs_end, key_end)
+
+            print(
+                f"Keys: [{key_start}, {key_end}] ({key_start / 10000000:.2f}s - {key_end / 10000000:.2f}s Unix)"
+            )
+            print(f"Overlap: [{overlap_start}, {overlap_end}]")
+
+            if overlap_start >= overlap_end:
+                print("Warning: No overlapping time range")
+                stats["status"] = "skipped"
+                stats["reason"] = "no overlap"
+                return stats
+
+            # Skip frames outside overlap range
+            in_range = (frame_times >= overlap_start) & (frame_times < overlap_end)
+
+            # Skip frames that fall within paused time ranges
+            paused = in_range & parser_obj.paused_mask(frame_times)
+            skipped_paused = int(np.count_nonzero(paused))
+            keep = in_range & ~paused
+
+            frame_indices = np.flatnonzero(keep)
+            actions = parser_obj.get_actions_for_frames(
+                frame_times[frame_indices], duration_ms=200
+            ).to_lumine_format()
+
+            for i, action in zip(
+                tqdm(frame_indices.tolist(), desc="Processing frames"), actions
+            ):
+                dataset.add_sample(
+                    frame_idx=valid_count, frame_path=frames[i], action=action
+                )
+                valid_count += 1
+
+        print(
+            f"Valid frames: {valid_count}/{len(frames)} (skipped {skipped_paused} paused frames)"
+        )
+
+        dataset.save()
+        print(f"Done: {log_f.stem}")
+
+    stats.update(
+        status="ok",
+        frames=len(frames),
+        valid=valid_count,
+        skipped_paused=skipped_paused,
+        hwaccel=video_proc.hwaccel,
+    )
+    return stats
+
+
+def _run_session(log_f: Path, video_f: Path, output_base: Path, args) -> Dict:
+    """process_session with per-session failure isolation"""
+    try:
+        return process_session(log_f, video_f, output_base, args)
+    except Exception:
+        return {
+            "session": log_f.stem,
+            "status": "failed",
+            "error": traceback.format_exc(),
+        }
+
+
+def print_summary(results: List[Dict]):
+    """Print aggregated statistics over all processed sessions"""
+    by_status = defaultdict(list)
+    for r in results:
+        by_status[r["status"]].append(r)
+
+    ok = by_status["ok"]
+    print(
+        f"\nSessions: {len(ok)} ok, {len(by_status['skipped'])} skipped, {len(by_status['failed'])} failed"
+    )
+    print(
+        f"Frames: {sum(r['valid'] for r in ok)} valid / {sum(r['frames'] for r in ok)} total "
+        f"(skipped {sum(r['skipped_paused'] for r in ok)} paused)"
+    )
+    for r in by_status["skipped"]:
+        print(f"  skipped {r['session']}: {r['reason']}")
+    for r in by_status["failed"]:
+        print(f"  FAILED {r['session']}:\n{r.get('error', '')}")
 
 
 def main():
@@ -393,9 +1512,120 @@ def main():
         "--offset", type=int, default=0, help="Timestamp offset (100ns)"
     )
     parser.add_argument("--skip-video", action="store_true", help="Skip extraction")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Parse the log in bounded-memory blocks, aligning frames as it reads",
+    )
+    parser.add_argument(
+        "--no-log-cache",
+        action="store_true",
+        help="Always re-parse text logs instead of using/writing .npz sidecars",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["ffmpeg", "pipe"],
+        default="ffmpeg",
+        help="ffmpeg: write PNGs from ffmpeg; pipe: decode raw frames in-process "
+        "and write --frame-format (default: ffmpeg)",
+    )
+    parser.add_argument(
+        "--frame-format",
+        choices=FRAME_FORMATS,
+        default="jpeg",
+        help="Frame output for --engine pipe (default: jpeg)",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=["jsonl", "wds"],
+        default="jsonl",
+        help=f"jsonl: per-session metadata.jsonl/stage1_pretrain.jsonl; wds: "
+        f"training-ready tar shards (frame + action) in OUTPUT/{SHARD_DIR} "
+        "(default: jsonl)",
+    )
+    parser.add_argument(
+        "--quality", type=int, default=90, help="JPEG/WebP quality (default: 90)"
+    )
+    parser.add_argument(
+        "--shard-size",
+        type=int,
+        default=1000,
+        help="Frames per tar shard for --frame-format wds, samples per shard "
+        "for --output-format wds (default: 1000)",
+    )
+    parser.add_argument(
+        "--hwaccel",
+        choices=HWACCELS,
+        default="auto",
+        help="Decode path; auto probes cuda, then vaapi, then cpu (default: auto)",
+    )
+    parser.add_argument(
+        "--decode-threads",
+        type=int,
+        default=0,
+        help="ffmpeg threads for cpu decoding, 0 = auto (default: 0)",
+    )
+    parser.add_argument(
+        "--segments",
+        type=int,
+        default=1,
+        help="Decode each video as N keyframe-aligned segments in parallel "
+        "(--engine ffmpeg only, default: 1)",
+    )
+    parser.add_argument(
+        "--chunk-frames",
+        type=int,
+        default=0,
+        help="Split extraction into resumable chunks of about N frames "
+        "(--engine ffmpeg only, default: 0, one chunk per --segments)",
+    )
+    parser.add_argument(
+        "--verify-frames",
+        action="store_true",
+        help="Re-check CRC32 of previously extracted frames, not just sizes",
+    )
+    parser.add_argument(
+        "--probe-jobs",
+        type=int,
+        default=8,
+        help="Videos probed concurrently before processing (default: 8)",
+    )
+    parser.add_argument(
+        "--no-probe-cache",
+        action="store_true",
+        help=f"Always re-run ffprobe instead of using OUTPUT/{PROBE_CACHE}",
+    )
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="Benchmark every available decode path on the first video and exit",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Process sessions in N worker processes (default: 1)",
+    )
+    parser.add_argument(
+        "--ffmpeg-jobs",
+        type=int,
+        default=0,
+        help="Max concurrent ffmpeg processes across workers, each --segments "
+        "segment counting as one (default: --workers x --segments)",
+    )
 
     args = parser.parse_args()
 
+    if (
+        args.output_format == "wds"
+        and args.engine == "pipe"
+        and args.frame_format in ("wds", "memmap")
+    ):
+        parser.error(
+            "--output-format wds needs frames as image files "
+            "(--frame-format jpeg, webp or png)"
+        )
+
     log_path = Path(args.log)
     video_path = Path(args.video)
     output_base = Path(args.output)
@@ -408,101 +1638,73 @@ def main():
         log_files = sorted(log_path.glob("*.txt"))
         video_files = [video_path / f"{f.stem}.mkv" for f in log_files]
 
-    for log_f, video_f in tqdm(
-        zip(log_files, video_files), total=len(log_files), desc="Processing pairs"
-    ):
-        if not video_f.exists():
-            continue
+    pairs = list(zip(log_files, video_files))
 
-        print(f"\nProcessing: {log_f.name}")
-        output_dir = output_base / log_f.stem
-
-        parser_obj = KeyRecorderParser(str(log_f)).parse()
-
-        video_proc = VideoProcessor(
+    if args.benchmark:
+        video_f = next((v for _, v in pairs if v.exists()), None)
+        if video_f is None:
+            print("Error: no video to benchmark")
+            return
+        print(f"Benchmarking decode paths on {video_f.name}")
+        VideoProcessor(
             str(video_f),
-            str(output_dir / "frames"),
+            str(output_base),
             fps=args.fps,
             width=args.width,
             height=args.height,
+            threads=args.decode_threads,
+        ).benchmark()
+        return
+
+    if not args.no_probe_cache:
+        # One ffprobe per video, run concurrently and cached up front so
+        # sessions (in any worker) only read the cache
+        videos = [v for _, v in pairs if v.exists()]
+        print(f"Probing {len(videos)} videos")
+        probe_videos(videos, str(output_base / PROBE_CACHE), jobs=args.probe_jobs)
+
+    results = []
+
+    if args.workers <= 1:
+        if args.ffmpeg_jobs > 0:
+            # Segment threads of this process share the slots
+            _init_worker(threading.BoundedSemaphore(args.ffmpeg_jobs))
+        for log_f, video_f in tqdm(pairs, desc="Processing pairs"):
+            results.append(_run_session(log_f, video_f, output_base, args))
+    else:
+        ctx = multiprocessing.get_context()
+        ffmpeg_slots = ctx.BoundedSemaphore(
+            args.ffmpeg_jobs
+            if args.ffmpeg_jobs > 0
+            else args.workers * max(1, args.segments)
         )
+        with ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(ffmpeg_slots,),
+        ) as pool:
+            futures = {
+                pool.submit(_run_session, log_f, video_f, output_base, args): log_f
+                for log_f, video_f in pairs
+            }
+            progress = tqdm(as_completed(futures), total=len(futures), desc="Sessions")
+            for future in progress:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # The worker process itself died (e.g. BrokenProcessPool)
+                    result = {
+                        "session": futures[future].stem,
+                        "status": "failed",
+                        "error": repr(e),
+                    }
+                results.append(result)
+                progress.set_postfix(
+                    failed=sum(r["status"] == "failed" for r in results)
+                )
 
-        frames = []
-        if not args.skip_video:
-            frames = video_proc.extract_frames()
-        else:
-            frames = sorted((output_dir / "frames").glob("frame_*.png"))
-
-        if not frames:
-            continue
-
-        video_start, video_end = video_proc.get_video_info()
-        video_start = video_start if video_start else 0
-
-        # Convert video PTS to absolute FILETIME using file creation time
-        video_ctime = os.path.getctime(str(video_f))
-        video_ctime_filetime = int(video_ctime * 10000000) + 116444736000000000
-        # Video absolute start = file creation time + video PTS offset
-        video_abs_start = video_ctime_filetime + video_start
-
-        # Key recorder time range
-        key_start = parser_obj.start_timestamp if parser_obj.start_timestamp else 0
-        key_end = (
-            parser_obj.key_chunks[-1].timestamp if parser_obj.key_chunks else key_start
-        )
-
-        # Calculate video absolute end time
-        frame_interval_100ns = 10000000 // args.fps
-        video_frames_count = len(frames)
-        video_abs_end = video_abs_start + (video_frames_count * frame_interval_100ns)
-
-        # Find overlap between video and key timestamps
-        overlap_start = max(video_abs_start, key_start)
-        overlap_end = min(video_abs_end, key_end)
-
-        print(
-            f"Video: [{video_abs_start}, {video_abs_end}] ({video_abs_start / 10000000:.2f}s - {video_abs_end / 10000000:.2f}s Unix)"
-        )
-        print(
-            f"Keys: [{key_start}, {key_end}] ({key_start / 10000000:.2f}s - {key_end / 10000000:.2f}s Unix)"
-        )
-        print(f"Overlap: [{overlap_start}, {overlap_end}]")
-
-        if overlap_start >= overlap_end:
-            print("Warning: No overlapping time range")
-            continue
-
-        dataset = LumineDataset(str(output_dir))
-
-        valid_count = 0
-        skipped_paused = 0
-        for i, frame in enumerate(tqdm(frames, desc="Processing frames")):
-            # Frame absolute time = video absolute start + frame offset
-            frame_time = video_abs_start + (i * frame_interval_100ns)
-
-            # Skip frames outside overlap range
-            if frame_time < overlap_start or frame_time >= overlap_end:
-                continue
-
-            # Skip frames that fall within paused time ranges
-            if parser_obj.is_paused(frame_time):
-                skipped_paused += 1
-                continue
-
-            action_frame = parser_obj.get_actions_at_time(frame_time, duration_ms=200)
-            dataset.add_sample(
-                frame_idx=valid_count,
-                frame_path=frame,
-                action=action_frame.to_lumine_format(),
-            )
-            valid_count += 1
-
-        print(
-            f"Valid frames: {valid_count}/{len(frames)} (skipped {skipped_paused} paused frames)"
-        )
-
-        dataset.save()
-        print(f"Done: {log_f.stem}")
+    print_summary(results)
 
 
 if __name__ == "__main__":
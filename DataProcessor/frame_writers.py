@@ -0,0 +1,328 @@
+"""
+frame_writers - Sinks for raw RGB frames decoded straight from ffmpeg
+
+VideoProcessor.decode_frames pipes rawvideo out of ffmpeg and hands each
+frame to one of these writers, so frames never round-trip through PNG.
+
+    jpeg / webp / png  one image file per frame, encoded with Pillow
+    wds                WebDataset-style tar shards of encoded frames
+    memmap             one uint8 array file, readable with open_frame_memmap()
+
+Each writer returns, per frame, the name later stages store as the
+sample's "image" (a real file for image writers, the member name inside a
+shard, or the row name in the memmap).
+"""
+
+import io
+import json
+import os
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+try:
+    from PIL import Image
+except ImportError:  # Only needed for encoded outputs
+    Image = None
+
+FRAME_FORMATS = ["jpeg", "webp", "png", "wds", "memmap"]
+
+_EXTENSIONS = {"jpeg": "jpg", "webp": "webp", "png": "png"}
+
+# Suffixes of every frame file the image writers (and ffmpeg's PNGs) produce
+FRAME_EXTENSIONS = tuple(f".{ext}" for ext in _EXTENSIONS.values())
+
+
+def encode_frame(
+    frame: bytes, width: int, height: int, fmt: str, quality: int
+) -> bytes:
+    """Encode one raw RGB24 frame to image bytes"""
+    if Image is None:
+        raise RuntimeError("Pillow is required for encoded frame output")
+    img = Image.frombuffer("RGB", (width, height), frame, "raw", "RGB", 0, 1)
+    buf = io.BytesIO()
+    if fmt == "png":
+        img.save(buf, format="PNG", compress_level=1)
+    else:
+        img.save(buf, format=fmt.upper(), quality=quality)
+    return buf.getvalue()
+
+
+class FrameWriter:
+    """Base class: receives raw RGB24 frames in order"""
+
+    def __init__(self, output_dir: str, width: int, height: int):
+        self.output_dir = Path(output_dir)
+        self.width = width
+        self.height = height
+        self.names: List[Path] = []
+
+    def existing_frames(self) -> List[Path]:
+        """Frame names from a previous complete run, or [] to decode"""
+        return []
+
+    def write(self, frame: bytes) -> Path:
+        raise NotImplementedError
+
+    def close(self) -> List[Path]:
+        return self.names
+
+    def abort(self):
+        """Called instead of close() when decoding failed"""
+
+    def __enter__(self):
+        # Each with-block writes from frame 0, so a failed decode can retry
+        self.names = []
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+
+
+class ImageFrameWriter(FrameWriter):
+    """One encoded image per frame, encoded on a thread pool"""
+
+    def __init__(
+        self,
+        output_dir: str,
+        width: int,
+        height: int,
+        fmt: str = "jpeg",
+        quality: int = 90,
+        workers: Optional[int] = None,
+    ):
+        super().__init__(output_dir, width, height)
+        if Image is None:
+            raise RuntimeError(
+                "Pillow is required for --frame-format jpeg/webp/png (pip install Pillow)"
+            )
+        self.fmt = fmt
+        self.ext = _EXTENSIONS[fmt]
+        self.quality = quality
+        # Pillow releases the GIL while encoding, so threads scale
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pending = []
+
+    @property
+    def marker_path(self) -> Path:
+        return self.output_dir / "images.json"
+
+    def existing_frames(self) -> List[Path]:
+        # Only a run that reached close() wrote the marker; without it the
+        # image files may be a partial set and are decoded again
+        if not self.marker_path.exists():
+            return []
+        with open(self.marker_path, "r", encoding="utf-8") as f:
+            count = json.load(f)["count"]
+        frames = [self.output_dir / f"frame_{i:05d}.{self.ext}" for i in range(count)]
+        return frames if all(p.exists() for p in frames) else []
+
+    def __enter__(self):
+        self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        self._pending = []
+        return super().__enter__()
+
+    def _encode_to(self, path: Path, frame: bytes):
+        data = encode_frame(frame, self.width, self.height, self.fmt, self.quality)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def write(self, frame: bytes) -> Path:
+        if not self.names and self.marker_path.exists():
+            self.marker_path.unlink()
+        path = self.output_dir / f"frame_{len(self.names):05d}.{self.ext}"
+        self._pending.append(self._pool.submit(self._encode_to, path, frame))
+        self.names.append(path)
+
+        # Bound the number of raw frames waiting in memory
+        if len(self._pending) >= self.workers * 4:
+            for future in self._pending:
+                future.result()
+            self._pending = []
+        return path
+
+    def close(self) -> List[Path]:
+        for future in self._pending:
+            future.result()
+        self._pending = []
+        self._pool.shutdown()
+        with open(self.marker_path, "w", encoding="utf-8") as f:
+            json.dump({"count": len(self.names), "format": self.fmt}, f)
+        return self.names
+
+    def abort(self):
+        self._pool.shutdown(cancel_futures=True)
+
+
+class ShardFrameWriter(FrameWriter):
+    """Encoded frames packed into fixed-size tar shards (frames-000000.tar)"""
+
+    def __init__(
+        self,
+        output_dir: str,
+        width: int,
+        height: int,
+        fmt: str = "jpeg",
+        quality: int = 90,
+        shard_size: int = 1000,
+    ):
+        super().__init__(output_dir, width, height)
+        if Image is None:
+            raise RuntimeError(
+                "Pillow is required for --frame-format wds (pip install Pillow)"
+            )
+        self.fmt = fmt
+        self.ext = _EXTENSIONS[fmt]
+        self.quality = quality
+        self.shard_size = shard_size
+        self._tar: Optional[tarfile.TarFile] = None
+        self._shard_paths: List[Path] = []
+
+    @property
+    def index_path(self) -> Path:
+        return self.output_dir / "shards.json"
+
+    def existing_frames(self) -> List[Path]:
+        if not self.index_path.exists():
+            return []
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        return [Path(name) for name in index["frames"]]
+
+    def __enter__(self):
+        self._shard_paths = []
+        return super().__enter__()
+
+    def _add_member(self, name: str, data: bytes):
+        if len(self.names) % self.shard_size == 0 or self._tar is None:
+            if self._tar is not None:
+                self._tar.close()
+            shard = self.output_dir / f"frames-{len(self._shard_paths):06d}.tar"
+            self._shard_paths.append(shard)
+            self._tar = tarfile.open(shard, "w")
+
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        self._tar.addfile(info, io.BytesIO(data))
+
+    def write(self, frame: bytes) -> Path:
+        name = Path(f"frame_{len(self.names):05d}.{self.ext}")
+        data = encode_frame(frame, self.width, self.height, self.fmt, self.quality)
+        self._add_member(name.name, data)
+        self.names.append(name)
+        return name
+
+    def close(self) -> List[Path]:
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+        with open(self.index_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "shards": [p.name for p in self._shard_paths],
+                    "shard_size": self.shard_size,
+                    "frames": [str(n) for n in self.names],
+                },
+                f,
+            )
+        return self.names
+
+    def abort(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+
+
+class MemmapFrameWriter(FrameWriter):
+    """Raw frames appended to frames.u8, shape recorded in frames.json"""
+
+    def __init__(self, output_dir: str, width: int, height: int):
+        super().__init__(output_dir, width, height)
+        self._file = None
+
+    @property
+    def data_path(self) -> Path:
+        return self.output_dir / "frames.u8"
+
+    @property
+    def header_path(self) -> Path:
+        return self.output_dir / "frames.json"
+
+    def existing_frames(self) -> List[Path]:
+        if not self.header_path.exists():
+            return []
+        with open(self.header_path, "r", encoding="utf-8") as f:
+            count = json.load(f)["count"]
+        return [Path(f"frame_{i:05d}") for i in range(count)]
+
+    def write(self, frame: bytes) -> Path:
+        if self._file is None:
+            # Header is written on close, so a partial file is never trusted
+            if self.header_path.exists():
+                self.header_path.unlink()
+            self._file = open(self.data_path, "wb", buffering=8 * 1024 * 1024)
+        self._file.write(frame)
+        name = Path(f"frame_{len(self.names):05d}")
+        self.names.append(name)
+        return name
+
+    def close(self) -> List[Path]:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        with open(self.header_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "count": len(self.names),
+                    "height": self.height,
+                    "width": self.width,
+                    "channels": 3,
+                    "dtype": "uint8",
+                },
+                f,
+            )
+        return self.names
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def open_frame_memmap(frames_dir: str) -> np.ndarray:
+    """Read-only (count, height, width, 3) view of a MemmapFrameWriter output"""
+    frames_dir = Path(frames_dir)
+    with open(frames_dir / "frames.json", "r", encoding="utf-8") as f:
+        header = json.load(f)
+    return np.memmap(
+        frames_dir / "frames.u8",
+        dtype=np.uint8,
+        mode="r",
+        shape=(header["count"], header["height"], header["width"], 3),
+    )
+
+
+def make_frame_writer(
+    fmt: str,
+    output_dir: str,
+    width: int,
+    height: int,
+    quality: int = 90,
+    shard_size: int = 1000,
+) -> FrameWriter:
+    """Build the writer for a --frame-format value"""
+    if fmt == "memmap":
+        return MemmapFrameWriter(output_dir, width, height)
+    if fmt == "wds":
+        return ShardFrameWriter(
+            output_dir, width, height, quality=quality, shard_size=shard_size
+        )
+    if fmt in _EXTENSIONS:
+        return ImageFrameWriter(output_dir, width, height, fmt=fmt, quality=quality)
+    raise ValueError(f"Unknown frame format: {fmt}")
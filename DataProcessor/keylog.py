@@ -0,0 +1,228 @@
+"""
+keylog - Columnar storage for KeyRecorder logs
+
+Every log line becomes one row in a set of typed NumPy columns instead of a
+Python object, so multi-hour recordings stay compact in memory.
+
+Parsed logs are cached in a binary sidecar next to the text log
+(session.txt -> session.txt.npz), keyed by the log's size and mtime, so
+later runs skip the text parse entirely.
+
+Usage:
+    from keylog import load_event_log, EVENT_MOUSE_REL
+
+    log = load_event_log("session.txt")
+    rel = log.codes == EVENT_MOUSE_REL
+    print(log.dx[rel].sum(), log.dy[rel].sum())
+"""
+
+import os
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from npz_cache import read_npz, write_npz
+
+# Event type codes stored in EventLog.codes
+EVENT_OTHER = 0  # recognised timestamp, unknown/unused event (e.g. MOUSE,SHOW)
+EVENT_KEY_CHUNK = 1
+EVENT_MOUSE_REL = 2
+EVENT_MOUSE_ABS = 3
+EVENT_WHEEL = 4
+EVENT_LOCK = 5
+EVENT_UNLOCK = 6
+EVENT_PAUSE = 7
+EVENT_RESUME = 8
+
+# Bump when the sidecar layout or parsing rules change
+SIDECAR_VERSION = 1
+
+
+@dataclass
+class EventLog:
+    """Struct-of-arrays view of a KeyRecorder log, in file order"""
+
+    timestamps: np.ndarray  # int64, 100-nanosecond intervals (FILETIME)
+    codes: np.ndarray  # int8, EVENT_* code
+    dx: np.ndarray  # int32, MOUSE_REL dx / MOUSE_ABS x
+    dy: np.ndarray  # int32, MOUSE_REL dy / MOUSE_ABS y
+    delta: np.ndarray  # int32, MOUSE,WHEEL delta
+    key_ids: np.ndarray  # int32, index into key_vocab (-1 if not KEY_CHUNK)
+    key_vocab: List[str]  # interned KEY_CHUNK payloads, e.g. "W LB"
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+
+class EventLogBuilder:
+    """Accumulate log lines into compact typed buffers"""
+
+    def __init__(self):
+        self.timestamps = array("q")
+        self.codes = array("b")
+        self.dx = array("i")
+        self.dy = array("i")
+        self.delta = array("i")
+        self.key_ids = array("i")
+        self.key_vocab: List[str] = []
+        self._key_index: Dict[str, int] = {}
+
+    def feed(self, lines: Iterable[str]):
+        """Parse an iterable of raw log lines"""
+        # Local aliases keep the per-line cost down on multi-million line logs
+        timestamps = self.timestamps.append
+        codes = self.codes.append
+        dxs = self.dx.append
+        dys = self.dy.append
+        deltas = self.delta.append
+        key_ids = self.key_ids.append
+        key_index = self._key_index
+
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            parts = line.split(",")
+            if len(parts) < 2:
+                continue
+
+            dx = dy = delta = 0
+            key_id = -1
+            try:
+                timestamp = int(parts[0])
+                event_type = parts[1]
+
+                if event_type == "KEY_CHUNK":
+                    code = EVENT_KEY_CHUNK
+                    keys = parts[2] if len(parts) > 2 else ""
+                    key_id = key_index.get(keys)
+                    if key_id is None:
+                        key_id = key_index[keys] = len(self.key_vocab)
+                        self.key_vocab.append(keys)
+                elif event_type == "MOUSE_REL":
+                    code = EVENT_MOUSE_REL
+                    dx = int(parts[2]) if len(parts) > 2 else 0
+                    dy = int(parts[3]) if len(parts) > 3 else 0
+                elif event_type == "MOUSE_ABS":
+                    code = EVENT_MOUSE_ABS
+                    dx = int(parts[2]) if len(parts) > 2 else 0
+                    dy = int(parts[3]) if len(parts) > 3 else 0
+                elif event_type == "MOUSE":
+                    sub = parts[2] if len(parts) > 2 else ""
+                    if sub == "WHEEL":
+                        code = EVENT_WHEEL
+                        delta = int(parts[3]) if len(parts) > 3 else 0
+                    elif sub == "LOCK":
+                        code = EVENT_LOCK
+                    elif sub == "UNLOCK":
+                        code = EVENT_UNLOCK
+                    else:
+                        code = EVENT_OTHER
+                elif event_type == "PAUSE":
+                    code = EVENT_PAUSE
+                elif event_type == "RESUME":
+                    code = EVENT_RESUME
+                else:
+                    code = EVENT_OTHER
+            except ValueError:
+                continue
+
+            timestamps(timestamp)
+            codes(code)
+            dxs(dx)
+            dys(dy)
+            deltas(delta)
+            key_ids(key_id)
+
+        return self
+
+    def build(self) -> EventLog:
+        """Freeze the buffers into an EventLog"""
+        return EventLog(
+            timestamps=np.frombuffer(self.timestamps, dtype=np.int64).copy(),
+            codes=np.frombuffer(self.codes, dtype=np.int8).copy(),
+            dx=np.frombuffer(self.dx, dtype=np.int32).copy(),
+            dy=np.frombuffer(self.dy, dtype=np.int32).copy(),
+            delta=np.frombuffer(self.delta, dtype=np.int32).copy(),
+            key_ids=np.frombuffer(self.key_ids, dtype=np.int32).copy(),
+            key_vocab=list(self.key_vocab),
+        )
+
+    def drain(self) -> EventLog:
+        """build() and empty the buffers, keeping the key vocabulary"""
+        log = self.build()
+        for buf in (
+            self.timestamps,
+            self.codes,
+            self.dx,
+            self.dy,
+            self.delta,
+            self.key_ids,
+        ):
+            del buf[:]
+        return log
+
+
+def read_event_log(log_path: str) -> EventLog:
+    """Parse a KeyRecorder text log into an EventLog"""
+    builder = EventLogBuilder()
+    with open(log_path, "r", encoding="utf-8") as f:
+        builder.feed(f)
+    return builder.build()
+
+
+def sidecar_path(log_path: str) -> Path:
+    """Binary cache file written next to a text log"""
+    return Path(str(log_path) + ".npz")
+
+
+def _read_sidecar(path: Path, stat: os.stat_result) -> Optional[EventLog]:
+    """Load a sidecar, or None if it is missing, stale or unreadable"""
+    data = read_npz(path, stat, {"version": SIDECAR_VERSION})
+    if data is None:
+        return None
+    return EventLog(
+        timestamps=data["timestamps"],
+        codes=data["codes"],
+        dx=data["dx"],
+        dy=data["dy"],
+        delta=data["delta"],
+        key_ids=data["key_ids"],
+        key_vocab=data["key_vocab"].tolist(),
+    )
+
+
+def _write_sidecar(path: Path, stat: os.stat_result, log: EventLog):
+    """Atomically write a sidecar; failures only cost the cache"""
+    write_npz(
+        path,
+        stat,
+        {"version": SIDECAR_VERSION},
+        {
+            "timestamps": log.timestamps,
+            "codes": log.codes,
+            "dx": log.dx,
+            "dy": log.dy,
+            "delta": log.delta,
+            "key_ids": log.key_ids,
+            "key_vocab": np.array(log.key_vocab, dtype=str),
+        },
+    )
+
+
+def load_event_log(log_path: str, use_cache: bool = True) -> EventLog:
+    """read_event_log, reusing/refreshing the binary sidecar when enabled"""
+    if not use_cache:
+        return read_event_log(log_path)
+
+    stat = os.stat(log_path)
+    cache = sidecar_path(log_path)
+    log = _read_sidecar(cache, stat)
+    if log is None:
+        log = read_event_log(log_path)
+        _write_sidecar(cache, stat, log)
+    return log
@@ -0,0 +1,77 @@
+"""
+npz_cache - Atomic .npz caches validated against their source file
+
+Several stages cache arrays derived from a source file: the binary event
+log sidecar (keylog), ffprobe results (video_probe), sampled frame
+timestamps (DataProcessor) and the editor's metadata line index
+(DataEditor). Each entry records the source's size and mtime plus a few
+caller-chosen key fields; a mismatch, or a missing or damaged file, is a
+cache miss.
+
+Usage:
+    from npz_cache import read_npz, write_npz
+
+    stat = os.stat(source)
+    data = read_npz(cache, stat, {"version": 1})
+    if data is None:
+        data = {"values": compute(source)}
+        write_npz(cache, stat, {"version": 1}, data)
+"""
+
+import os
+import zipfile
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+
+def read_npz(
+    path: Path, source_stat: os.stat_result, key: Dict
+) -> Optional[Dict[str, np.ndarray]]:
+    """Arrays of a cache entry, or None if it is missing, stale or unreadable"""
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if (
+                int(data["source_size"]) != source_stat.st_size
+                or int(data["source_mtime_ns"]) != source_stat.st_mtime_ns
+            ):
+                return None
+            for name, value in key.items():
+                if data[name].item() != value:
+                    return None
+            return {name: data[name] for name in data.files}
+    except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile):
+        return None
+
+
+def write_npz(
+    path: Path,
+    source_stat: os.stat_result,
+    key: Dict,
+    arrays: Dict[str, np.ndarray],
+    warn: bool = True,
+) -> bool:
+    """Atomically write a cache entry; failures only cost the cache"""
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                source_size=np.int64(source_stat.st_size),
+                source_mtime_ns=np.int64(source_stat.st_mtime_ns),
+                **{name: np.array(value) for name, value in key.items()},
+                **arrays,
+            )
+        os.replace(tmp, path)
+        return True
+    except OSError as e:
+        if warn:
+            print(f"Warning: could not write cache {path}: {e}")
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return False
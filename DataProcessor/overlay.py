@@ -1,36 +1,122 @@
 import sys
 import time
+from bisect import bisect_right
+
 import pygame
 
+from keylog import (
+    load_event_log,
+    EVENT_KEY_CHUNK,
+    EVENT_MOUSE_REL,
+    EVENT_MOUSE_ABS,
+    EVENT_LOCK,
+    EVENT_UNLOCK,
+)
+
+
+class PlaybackCursor:
+    """Input state (held keys, lock, relative/absolute position) at any time
+
+    Playing forward applies only the events since the previous call. A
+    snapshot of the state is kept every SNAPSHOT_EVERY events as playback
+    passes them, so seeking anywhere is a bisect over the timestamps, a
+    snapshot restore and at most SNAPSHOT_EVERY events of replay.
+    """
+
+    SNAPSHOT_EVERY = 4096
+
+    def __init__(self, events, key_sets, center):
+        self.events = events  # (timestamp, code, dx, dy, key_id)
+        self.timestamps = [event[0] for event in events]
+        self.key_sets = key_sets
+        self.center = center  # where LOCK re-centres the relative position
+
+        self.pos = 0  # events[:pos] are applied
+        self.key_id = -1
+        self.locked = False
+        self.rel_x, self.rel_y = center
+        self.abs_x = self.abs_y = None
+        self.snapshots = [self._snapshot()]  # state before events[k * EVERY]
+
+    def _snapshot(self):
+        return (
+            self.key_id,
+            self.locked,
+            self.rel_x,
+            self.rel_y,
+            self.abs_x,
+            self.abs_y,
+        )
 
-def read_log_file(filepath):
-    events = []
-    with open(filepath, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-            parts = line.split(",")
-            if len(parts) >= 2:
-                try:
-                    timestamp = int(parts[0])
-                    event_type = parts[1]
-                    data = parts[2:] if len(parts) > 2 else []
-                    events.append((timestamp, event_type, data))
-                except ValueError:
-                    continue
-    return events
+    @property
+    def held_keys(self):
+        return self.key_sets[self.key_id] if self.key_id >= 0 else frozenset()
+
+    def _play(self, end):
+        """Apply events[pos:end]"""
+        every = self.SNAPSHOT_EVERY
+        snapshots = self.snapshots
+        for i in range(self.pos, end):
+            if i % every == 0 and i // every == len(snapshots):
+                snapshots.append(self._snapshot())
+
+            _, code, dx, dy, key_id = self.events[i]
+            if code == EVENT_KEY_CHUNK:
+                self.key_id = key_id
+            elif code == EVENT_LOCK:
+                self.locked = True
+                self.rel_x, self.rel_y = self.center
+            elif code == EVENT_UNLOCK:
+                self.locked = False
+            elif code == EVENT_MOUSE_ABS:
+                self.abs_x, self.abs_y = dx, dy
+            elif code == EVENT_MOUSE_REL:
+                self.rel_x += dx
+                self.rel_y += dy
+        self.pos = end
+
+    def seek(self, timestamp):
+        """Move to the state after every event at or before timestamp"""
+        target = bisect_right(self.timestamps, timestamp)
+        every = self.SNAPSHOT_EVERY
+        if not self.pos <= target < self.pos + every:
+            # Far or backwards: restart from the closest snapshot before it
+            k = min(target // every, len(self.snapshots) - 1)
+            if not k * every <= self.pos <= target:
+                (
+                    self.key_id,
+                    self.locked,
+                    self.rel_x,
+                    self.rel_y,
+                    self.abs_x,
+                    self.abs_y,
+                ) = self.snapshots[k]
+                self.pos = k * every
+        self._play(target)
 
 
 class Overlay:
     def __init__(self, filepath):
         self.filepath = filepath
-        self.events = read_log_file(filepath)
-        if not self.events:
+        log = load_event_log(filepath)
+        if not len(log):
             print("No events found in log file")
             sys.exit(1)
 
+        # Plain lists iterate much faster than NumPy scalars in the render loop
+        self.events = list(
+            zip(
+                log.timestamps.tolist(),
+                log.codes.tolist(),
+                log.dx.tolist(),
+                log.dy.tolist(),
+                log.key_ids.tolist(),
+            )
+        )
+        self.key_sets = [frozenset(keys.split()) for keys in log.key_vocab]
+
         self.first_timestamp = self.events[0][0]
+        self.last_timestamp = self.events[-1][0]
         self.program_start = time.time()
         self.offset = self.first_timestamp
         pygame.init()
@@ -50,6 +136,9 @@ class Overlay:
         self.grid_pos = list(self.center)
         self.cursor_locked = False
         self.held_keys = set()
+        self.cursor = PlaybackCursor(
+            self.events, self.key_sets, (self.rel_x, self.rel_y)
+        )
 
         self.font = pygame.font.Font(None, 36)
         self.small_font = pygame.font.Font(None, 24)
@@ -80,40 +169,23 @@ class Overlay:
         ctypes.windll.user32.SetWindowLongW(hwnd, GWL_EXSTYLE, ex_style | WS_EX_LAYERED)
         ctypes.windll.user32.SetLayeredWindowAttributes(hwnd, 0, 255, LWA_ALPHA)
 
-    def get_current_state(self):
+    def current_timestamp(self):
         elapsed_sec = time.time() - self.program_start
         elapsed_filetime = int(elapsed_sec * 10_000_000)
-        current_timestamp = self.offset + elapsed_filetime
-
-        x, y = None, None
-
-        for timestamp, event_type, data in self.events:
-            if timestamp > current_timestamp:
-                break
-
-            if event_type == "KEY_CHUNK":
-                self.held_keys = set(data[0].split()) if data else set()
-
-            elif event_type == "MOUSE":
-                if len(data) > 0:
-                    if data[0] == "LOCK":
-                        self.cursor_locked = True
-                        w, h = self.screen.get_size()
-                        self.rel_x, self.rel_y = w // 2, h // 2
-                    elif data[0] == "UNLOCK":
-                        self.cursor_locked = False
-            elif event_type == "MOUSE_ABS" and len(data) >= 2:
-                try:
-                    x = int(data[0])
-                    y = int(data[1])
-                except ValueError:
-                    pass
-            elif event_type == "MOUSE_REL" and len(data) >= 2:
-                try:
-                    self.rel_x += int(data[0])
-                    self.rel_y += int(data[1])
-                except ValueError:
-                    pass
+        return self.offset + elapsed_filetime
+
+    def seek_by(self, seconds):
+        """Jump playback by seconds, clamped to the recording"""
+        target = self.current_timestamp() + int(seconds * 10_000_000)
+        target = min(max(target, self.first_timestamp), self.last_timestamp)
+        self.offset += target - self.current_timestamp()
+
+    def get_current_state(self):
+        self.cursor.seek(self.current_timestamp())
+        self.held_keys = self.cursor.held_keys
+        self.cursor_locked = self.cursor.locked
+        self.rel_x, self.rel_y = self.cursor.rel_x, self.cursor.rel_y
+        x, y = self.cursor.abs_x, self.cursor.abs_y
 
         is_aim_mode = self.cursor_locked
 
@@ -127,7 +199,7 @@ class Overlay:
             return self.center, is_aim_mode
 
     def get_display_time(self):
-        elapsed = time.time() - self.program_start
+        elapsed = (self.current_timestamp() - self.first_timestamp) / 10_000_000
         secs = int(elapsed)
         mins = secs // 60
         secs = secs % 60
@@ -171,6 +243,14 @@ class Overlay:
                 elif event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_ESCAPE:
                         self.running = False
+                    elif event.key == pygame.K_LEFT:
+                        self.seek_by(-5)
+                    elif event.key == pygame.K_RIGHT:
+                        self.seek_by(5)
+                    elif event.key == pygame.K_PAGEUP:
+                        self.seek_by(-60)
+                    elif event.key == pygame.K_PAGEDOWN:
+                        self.seek_by(60)
 
             pos, is_aim_mode = self.get_current_state()
 
@@ -3,6 +3,14 @@ import time
 import ctypes
 from ctypes import wintypes
 
+from keylog import (
+    load_event_log,
+    EVENT_KEY_CHUNK,
+    EVENT_MOUSE_REL,
+    EVENT_MOUSE_ABS,
+    EVENT_WHEEL,
+)
+
 # WinAPI constants
 MOUSEEVENTF_MOVE = 0x0001
 MOUSEEVENTF_ABSOLUTE = 0x8000
@@ -21,25 +29,6 @@ KEYEVENTF_KEYUP = 0x0002
 user32 = ctypes.windll.user32
 
 
-def read_log_file(filepath):
-    events = []
-    with open(filepath, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-            parts = line.split(",")
-            if len(parts) >= 2:
-                try:
-                    timestamp = int(parts[0])
-                    event_type = parts[1]
-                    data = parts[2:] if len(parts) > 2 else []
-                    events.append((timestamp, event_type, data))
-                except ValueError:
-                    continue
-    return events
-
-
 VK_MAP = {
     "Esc": 0x1B,
     "Tab": 0x09,
@@ -129,11 +118,24 @@ def send_mouse_rel(dx, dy):
 class Replay:
     def __init__(self, filepath, speed=1.0, loop=True):
         self.filepath = filepath
-        self.events = read_log_file(filepath)
-        if not self.events:
+        log = load_event_log(filepath)
+        if not len(log):
             print("No events found in log file")
             sys.exit(1)
 
+        # Plain lists iterate much faster than NumPy scalars in the replay loop
+        self.events = list(
+            zip(
+                log.timestamps.tolist(),
+                log.codes.tolist(),
+                log.dx.tolist(),
+                log.dy.tolist(),
+                log.delta.tolist(),
+                log.key_ids.tolist(),
+            )
+        )
+        self.key_sets = [set(keys.split()) for keys in log.key_vocab]
+
         self.speed = speed
         self.loop = loop
         self.first_timestamp = self.events[0][0]
@@ -158,7 +160,7 @@ class Replay:
                 start_time = time.perf_counter()
                 self.release_all()
 
-                for timestamp, event_type, data in self.events:
+                for timestamp, code, dx, dy, delta, key_id in self.events:
                     if not self.running:
                         break
 
@@ -175,8 +177,8 @@ class Replay:
 
                         time.sleep(0.001)
 
-                    if event_type == "KEY_CHUNK":
-                        new_held = set(data[0].split()) if data else set()
+                    if code == EVENT_KEY_CHUNK:
+                        new_held = self.key_sets[key_id]
 
                         # Keys to press
                         for token in new_held - self.held_keys:
@@ -192,26 +194,16 @@ class Replay:
                             else:
                                 send_key(token, False)
 
-                        self.held_keys = new_held
-
-                    elif event_type == "MOUSE" and len(data) >= 2:
-                        if data[0] == "WHEEL":
-                            try:
-                                send_mouse_wheel(int(data[1]))
-                            except ValueError:
-                                pass
-
-                    elif event_type == "MOUSE_ABS" and len(data) >= 2:
-                        try:
-                            send_mouse_abs(int(data[0]), int(data[1]))
-                        except ValueError:
-                            pass
-
-                    elif event_type == "MOUSE_REL" and len(data) >= 2:
-                        try:
-                            send_mouse_rel(int(data[0]), int(data[1]))
-                        except ValueError:
-                            pass
+                        self.held_keys = set(new_held)
+
+                    elif code == EVENT_WHEEL:
+                        send_mouse_wheel(delta)
+
+                    elif code == EVENT_MOUSE_ABS:
+                        send_mouse_abs(dx, dy)
+
+                    elif code == EVENT_MOUSE_REL:
+                        send_mouse_rel(dx, dy)
 
                 if self.loop and self.running:
                     print("Looping...")
@@ -0,0 +1,209 @@
+"""
+video_probe - One-pass ffprobe metadata with an on-disk cache
+
+A single ffprobe run per video collects everything VideoProcessor needs:
+stream start time, duration, frame rate, resolution, codec and the
+packet-level PTS/keyframe index (demuxed only, never decoded).
+
+Results are cached as one .npz per video in a cache directory, keyed on the
+video's absolute path, size and mtime, so reruns and other worker
+processes skip ffprobe entirely.
+
+Usage:
+    from video_probe import load_video_info, probe_videos
+
+    probe_videos(video_paths, "out/.probe_cache", jobs=8)  # warm the cache
+    info = load_video_info("session.mkv", "out/.probe_cache")
+    print(info.fps, info.width, info.height, info.keyframe_times()[:5])
+"""
+
+import hashlib
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from npz_cache import read_npz, write_npz
+
+# Bump when the cache layout or probe fields change
+CACHE_VERSION = 1
+
+
+@dataclass
+class VideoInfo:
+    """Probed metadata of a video's first video stream"""
+
+    start_100ns: int  # stream start_time, 0 if unknown
+    end_100ns: int  # start + container duration, 0 if unknown
+    fps: float  # average frame rate, 0.0 if unknown
+    width: int
+    height: int
+    codec: str
+    packet_pts: np.ndarray  # float64 seconds, presentation order
+    packet_keyframe: np.ndarray  # bool, aligned with packet_pts
+
+    def keyframe_times(self) -> List[float]:
+        return self.packet_pts[self.packet_keyframe].tolist()
+
+
+def _parse_rate(value: str) -> float:
+    """ffprobe rational ("30000/1001") to float, 0.0 if unknown"""
+    try:
+        num, _, den = value.partition("/")
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def probe_video(video_path: str) -> VideoInfo:
+    """Run the combined ffprobe on one video"""
+    cmd = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-select_streams",
+        "v:0",
+        "-show_entries",
+        "stream=codec_name,width,height,avg_frame_rate,r_frame_rate,start_time"
+        ":format=duration:packet=pts_time,flags",
+        "-of",
+        "compact=p=1",
+        str(video_path),
+    ]
+
+    stream: Dict[str, str] = {}
+    fmt: Dict[str, str] = {}
+    pts, keys = [], []
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        lines = result.stdout.splitlines()
+    except FileNotFoundError:
+        lines = []
+
+    # compact output: "section|key=value|key=value", one line per entry
+    for line in lines:
+        section, _, rest = line.partition("|")
+        fields = dict(f.split("=", 1) for f in rest.split("|") if "=" in f)
+        if section == "packet":
+            try:
+                pts.append(float(fields.get("pts_time", "")))
+            except ValueError:
+                continue
+            keys.append("K" in fields.get("flags", ""))
+        elif section == "stream":
+            stream = fields
+        elif section == "format":
+            fmt = fields
+
+    try:
+        start_100ns = int(float(stream.get("start_time", "")) * 10000000)
+    except ValueError:
+        start_100ns = 0
+    try:
+        end_100ns = start_100ns + int(float(fmt.get("duration", "")) * 10000000)
+    except ValueError:
+        end_100ns = 0
+
+    fps = _parse_rate(stream.get("avg_frame_rate", "")) or _parse_rate(
+        stream.get("r_frame_rate", "")
+    )
+    try:
+        width = int(stream.get("width", 0))
+        height = int(stream.get("height", 0))
+    except ValueError:
+        width = height = 0
+
+    # Packets arrive in decode order; B-frames make that differ from PTS
+    packet_pts = np.asarray(pts, dtype=np.float64)
+    order = np.argsort(packet_pts, kind="stable")
+    return VideoInfo(
+        start_100ns=start_100ns,
+        end_100ns=end_100ns,
+        fps=fps,
+        width=width,
+        height=height,
+        codec=stream.get("codec_name", ""),
+        packet_pts=packet_pts[order],
+        packet_keyframe=np.asarray(keys, dtype=bool)[order],
+    )
+
+
+def cache_path(video_path: str, cache_dir: str) -> Path:
+    """Cache file for a video: one entry per absolute path"""
+    key = hashlib.sha1(os.path.abspath(video_path).encode("utf-8")).hexdigest()
+    return Path(cache_dir) / f"{key[:16]}.npz"
+
+
+def _cache_key(video_path: str) -> Dict:
+    return {"version": CACHE_VERSION, "source_path": os.path.abspath(video_path)}
+
+
+def _read_cache(
+    path: Path, video_path: str, stat: os.stat_result
+) -> Optional[VideoInfo]:
+    """Load a cache entry, or None if it is missing, stale or unreadable"""
+    data = read_npz(path, stat, _cache_key(video_path))
+    if data is None:
+        return None
+    return VideoInfo(
+        start_100ns=int(data["start_100ns"]),
+        end_100ns=int(data["end_100ns"]),
+        fps=float(data["fps"]),
+        width=int(data["width"]),
+        height=int(data["height"]),
+        codec=str(data["codec"]),
+        packet_pts=data["packet_pts"],
+        packet_keyframe=data["packet_keyframe"],
+    )
+
+
+def _write_cache(path: Path, video_path: str, stat: os.stat_result, info: VideoInfo):
+    """Atomically write a cache entry; failures only cost the cache"""
+    write_npz(
+        path,
+        stat,
+        _cache_key(video_path),
+        {
+            "start_100ns": np.int64(info.start_100ns),
+            "end_100ns": np.int64(info.end_100ns),
+            "fps": np.float64(info.fps),
+            "width": np.int64(info.width),
+            "height": np.int64(info.height),
+            "codec": np.array(info.codec),
+            "packet_pts": info.packet_pts,
+            "packet_keyframe": info.packet_keyframe,
+        },
+    )
+
+
+def load_video_info(video_path: str, cache_dir: Optional[str] = None) -> VideoInfo:
+    """probe_video, reusing/refreshing the cache entry when cache_dir is set"""
+    if cache_dir is None:
+        return probe_video(video_path)
+
+    stat = os.stat(video_path)
+    path = cache_path(video_path, cache_dir)
+    info = _read_cache(path, video_path, stat)
+    if info is None:
+        info = probe_video(video_path)
+        # A failed probe (no ffprobe, unreadable file) is not worth keeping
+        if len(info.packet_pts) or info.end_100ns:
+            _write_cache(path, video_path, stat, info)
+    return info
+
+
+def probe_videos(
+    video_paths: Iterable[str], cache_dir: str, jobs: int = 8
+) -> Dict[str, VideoInfo]:
+    """Probe many videos concurrently, filling the cache
+
+    Each probe is an ffprobe subprocess, so threads are enough.
+    """
+    paths = [str(p) for p in video_paths if os.path.exists(p)]
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        infos = pool.map(lambda p: load_video_info(p, cache_dir), paths)
+        return dict(zip(paths, infos))